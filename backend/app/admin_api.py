@@ -9,6 +9,7 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from .database import Base, engine, get_db
+from .kb import kb_index
 from .models import AuditEvent, KbDocument, KbVersion, Role, User, UserRole
 from .schemas import KbDocumentOut, KbVersionOut, TokenResponse, UserCreate, UserOut
 from .security import create_access_token, get_password_hash, verify_password
@@ -170,6 +171,7 @@ def publish_doc(
         doc.current_version_id = latest_version.id
     doc.status = "published"
     db.commit()
+    kb_index.publish()
     _record_audit(db, current_user, "kb_document", str(doc.id), "review", "published")
     return _serialize_doc(doc)
 
@@ -0,0 +1,55 @@
+"""Compile the markdown KB into a single memory-mappable index artifact.
+
+Usage:
+    python -m app.build_kb_index --output kb_index.bin
+    KB_INDEX_PATH=kb_index.bin uvicorn app.main:app
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+from .config import settings
+from .kb import KB_ROOT, IndexedDocument
+from .kb_artifact import write_artifact
+
+
+def build_index(kb_dir: Path, output: Path) -> int:
+    documents: List[dict] = []
+    postings: Dict[str, List[List[int]]] = {}
+    lengths: List[int] = []
+    for path in sorted(kb_dir.rglob("*.md")):
+        document = IndexedDocument.from_file(path, kb_dir, path.stat())
+        for chunk in document.chunks:
+            chunk_id = len(lengths)
+            lengths.append(sum(chunk.terms.values()))
+            for term, count in chunk.terms.items():
+                postings.setdefault(term, []).append([chunk_id, count])
+        documents.append(
+            {
+                "ref": document.ref,
+                "title": document.title,
+                "metadata": document.metadata,
+                "chunks": [{"headings": chunk.headings, "text": chunk.text} for chunk in document.chunks],
+            }
+        )
+    write_artifact(output, documents, postings, lengths)
+    return len(documents)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb-dir", type=Path, default=KB_ROOT, help="Markdown KB root (default: repo kb/).")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path(settings.KB_INDEX_PATH or "kb_index.bin"),
+        help="Artifact path (default: KB_INDEX_PATH or kb_index.bin).",
+    )
+    args = parser.parse_args()
+    count = build_index(args.kb_dir, args.output)
+    print(f"Indexed {count} documents into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
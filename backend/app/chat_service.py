@@ -1,12 +1,20 @@
 from __future__ import annotations
 
-from typing import List
+import logging
+import re
+from typing import AsyncIterator, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
 
 from .config import settings
-from .kb import retrieve_snippets
-from .llm_client import call_llm
+from .concurrency import ConcurrencyLimitExceeded
+from .countries import country_label
+from .kb import retrieve_for_query
+from .llm_client import acall_llm, astream_llm, call_llm
+from .prompt_budget import estimate_tokens, fit_items, fit_recent
 from .schemas import ChatIn, ChatOut, SourceRef
 
+logger = logging.getLogger("visaverse")
 
 SUGGESTED_PROMPTS = [
     "What documents should I prioritize next?",
@@ -78,12 +86,40 @@ def _mock_chat_answer(chat_in: ChatIn, snippets: List[dict]) -> ChatOut:
 
 
 def _build_prompt(chat_in: ChatIn, snippets: List[dict]) -> str:
-    snippet_text = "\n".join(
-        f"- {snippet.get('title')}: {snippet.get('content', '')[:400]}" for snippet in snippets
+    """Chat prompt fitted to ``CHAT_PROMPT_TOKEN_BUDGET``.
+
+    The question and profile are always kept. Ranked snippets come next, but up
+    to a third of what is left stays reserved for history, which is then
+    filled most recent turn first.
+    """
+    snippet_lines = [f"- {snippet.get('title')}: {snippet.get('content', '')}" for snippet in snippets]
+    history_lines = [f"{msg.role}: {msg.content}" for msg in chat_in.history]
+    budget = settings.CHAT_PROMPT_TOKEN_BUDGET
+    if budget > 0:
+        remaining = budget - estimate_tokens(_render_chat_prompt(chat_in, "", ""))
+        history_tokens = sum(estimate_tokens(line) + 1 for line in history_lines)
+        snippet_lines = fit_items(snippet_lines, remaining - min(history_tokens, remaining // 3))
+        remaining -= sum(estimate_tokens(line) + 1 for line in snippet_lines)
+        history_lines = fit_recent(history_lines, remaining)
+    prompt = _render_chat_prompt(chat_in, "\n".join(snippet_lines), "\n".join(history_lines))
+    logger.info(
+        "prompt_assembled",
+        extra={
+            "feature": "chat",
+            "prompt_tokens_estimate": estimate_tokens(prompt),
+            "token_budget": budget,
+            "snippets_used": len(snippet_lines),
+            "snippets_total": len(snippets),
+            "history_used": len(history_lines),
+            "history_total": len(chat_in.history),
+        },
     )
-    history_text = "\n".join(f"{msg.role}: {msg.content}" for msg in chat_in.history)
+    return prompt
+
+
+def _render_chat_prompt(chat_in: ChatIn, snippet_text: str, history_text: str) -> str:
     profile_text = (
-        f"Origin: {chat_in.profile.origin_country}, Destination: {chat_in.profile.destination_country}, Purpose: {chat_in.profile.purpose}"
+        f"Origin: {country_label(chat_in.profile.origin_country)}, Destination: {country_label(chat_in.profile.destination_country)}, Purpose: {chat_in.profile.purpose}"
         if chat_in.profile
         else ""
     )
@@ -108,22 +144,88 @@ def _build_prompt(chat_in: ChatIn, snippets: List[dict]) -> str:
     )
 
 
-def generate_chat_response(chat_in: ChatIn) -> ChatOut:
-    snippets: List[dict] = []
-    if chat_in.profile:
-        snippets = retrieve_snippets(chat_in.profile, k=settings.MAX_SNIPPETS)
+MOCK_STREAM_PATTERN = re.compile(r"\S+\s*")
+
+CHAT_SYSTEM_PROMPT = "You are VisaVerse, a precise visa planning assistant."
+
+
+def _retrieve(chat_in: ChatIn) -> List[dict]:
+    return retrieve_for_query(
+        chat_in.message,
+        chat_in.profile,
+        k=settings.MAX_SNIPPETS,
+        mode=settings.CHAT_RETRIEVAL_MODE,
+    )
+
+
+def _chat_out(answer: str, snippets: List[dict]) -> ChatOut:
+    return ChatOut(answer=answer, sources=_snippet_sources(snippets), suggested_questions=SUGGESTED_PROMPTS[:3])
+
+
+def generate_chat_response(chat_in: ChatIn, use_cache: bool = True) -> ChatOut:
+    snippets = _retrieve(chat_in)
 
     if settings.MOCK_MODE or not settings.llm_api_key:
         return _mock_chat_answer(chat_in, snippets)
 
     try:
         prompt = _build_prompt(chat_in, snippets)
-        answer = call_llm(
-            prompt,
-            system_prompt="You are VisaVerse, a precise visa planning assistant.",
-            temperature=0.4,
-        )
-        sources = _snippet_sources(snippets)
-        return ChatOut(answer=answer, sources=sources, suggested_questions=SUGGESTED_PROMPTS[:3])
+        answer = call_llm(prompt, system_prompt=CHAT_SYSTEM_PROMPT, temperature=0.4, use_cache=use_cache)
+        return _chat_out(answer, snippets)
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception:
         return _mock_chat_answer(chat_in, snippets)
+
+
+async def agenerate_chat_response(chat_in: ChatIn, use_cache: bool = True) -> ChatOut:
+    snippets = await run_in_threadpool(_retrieve, chat_in)
+
+    if settings.MOCK_MODE or not settings.llm_api_key:
+        return _mock_chat_answer(chat_in, snippets)
+
+    try:
+        prompt = _build_prompt(chat_in, snippets)
+        answer = await acall_llm(prompt, system_prompt=CHAT_SYSTEM_PROMPT, temperature=0.4, use_cache=use_cache)
+        return _chat_out(answer, snippets)
+    except ConcurrencyLimitExceeded:
+        raise
+    except Exception:
+        return _mock_chat_answer(chat_in, snippets)
+
+
+async def astream_chat_response(chat_in: ChatIn) -> AsyncIterator[Tuple[str, dict]]:
+    """Yield ``(event, data)`` pairs: ``sources`` first, then ``delta`` chunks, then ``done``.
+
+    If the provider fails before the first delta, the mock answer is streamed
+    instead, mirroring ``agenerate_chat_response``; a failure after that point
+    ends the stream with an ``error`` event since text was already sent.
+    """
+    snippets = await run_in_threadpool(_retrieve, chat_in)
+    done = {"suggested_questions": SUGGESTED_PROMPTS[:3]}
+
+    if settings.MOCK_MODE or not settings.llm_api_key:
+        fallback = _mock_chat_answer(chat_in, snippets)
+        yield "sources", {"sources": [source.model_dump() for source in fallback.sources]}
+    else:
+        yield "sources", {"sources": [source.model_dump() for source in _snippet_sources(snippets)]}
+        streamed = False
+        try:
+            prompt = _build_prompt(chat_in, snippets)
+            async for delta in astream_llm(prompt, system_prompt=CHAT_SYSTEM_PROMPT, temperature=0.4):
+                streamed = True
+                yield "delta", {"text": delta}
+        except ConcurrencyLimitExceeded:
+            raise
+        except Exception as exc:
+            if streamed:
+                yield "error", {"code": "CHAT_STREAM_ERROR", "message": "Answer stream interrupted", "details": str(exc)}
+                return
+        if streamed:
+            yield "done", done
+            return
+        fallback = _mock_chat_answer(chat_in, snippets)
+
+    for piece in MOCK_STREAM_PATTERN.findall(fallback.answer):
+        yield "delta", {"text": piece}
+    yield "done", done
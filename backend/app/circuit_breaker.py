@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from .config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Per-provider breaker fed by call outcomes and latency.
+
+    The circuit opens after ``failure_threshold`` consecutive failures, or when
+    the failure rate over the last ``window`` calls reaches ``error_rate``; calls
+    slower than ``slow_call_seconds`` count as failures. After ``open_seconds``
+    up to ``half_open_calls`` probes are let through: one success closes the
+    circuit again, one failure reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        error_rate: float = 0.5,
+        window: int = 20,
+        slow_call_seconds: float = 10.0,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 1,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self.times_opened = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether ``allow`` could admit a call now, without reserving a half-open probe."""
+        with self._lock:
+            return self.state != OPEN or time.monotonic() - self.opened_at >= self.open_seconds
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self.opened_at = time.monotonic()
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls and time.monotonic() - self.opened_at >= self.open_seconds:
+                    # A probe never reported back (e.g. its request was cancelled); allow a new round.
+                    self.opened_at = time.monotonic()
+                    self._probes = 0
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self, duration: float) -> None:
+        if duration > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self.consecutive_failures = 0
+            self._outcomes.append(True)
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._outcomes.clear()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._outcomes.append(False)
+            if self.state == HALF_OPEN or self._should_open():
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def _should_open(self) -> bool:
+        if self.state != CLOSED:
+            return False
+        if self.consecutive_failures >= self.failure_threshold:
+            return True
+        if len(self._outcomes) < self._outcomes.maxlen:
+            return False
+        failures = self._outcomes.count(False)
+        return failures / len(self._outcomes) >= self.error_rate
+
+    def stats(self) -> Dict[str, object]:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "window_error_rate": self._outcomes.count(False) / calls if calls else None,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                error_rate=settings.LLM_BREAKER_ERROR_RATE,
+                window=settings.LLM_BREAKER_WINDOW,
+                slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+                open_seconds=settings.LLM_BREAKER_OPEN_SECONDS,
+                half_open_calls=settings.LLM_BREAKER_HALF_OPEN_CALLS,
+            )
+        return breaker
+
+
+def circuit_stats() -> Dict[str, Dict[str, object]]:
+    with _breakers_lock:
+        return {name: breaker.stats() for name, breaker in _breakers.items()}
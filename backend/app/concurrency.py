@@ -0,0 +1,210 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from .config import settings
+
+
+class ConcurrencyLimitExceeded(RuntimeError):
+    """The provider's wait queue is full (or the wait timed out); the caller should answer 429."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, event: Optional[threading.Event] = None, future: Optional[asyncio.Future] = None) -> None:
+        self.event = event
+        self.future = future
+        self.loop = future.get_loop() if future is not None else None
+        self.granted = False
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Slot:
+    """Filled in by the caller so the limiter can adapt when the slot is released."""
+
+    def __init__(self) -> None:
+        self.latency: Optional[float] = None
+        self.overloaded = False
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one provider, with a bounded FIFO wait queue.
+
+    Each call that finishes within ``latency_target`` raises the limit by
+    ``1 / limit`` (about +1 per round of calls); a provider 429, a timeout or a
+    slower call halves it, at most once per ``latency_target`` so one burst of
+    failures counts as one signal. Threads and coroutines share the same slots.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        max_queue: int = 100,
+        queue_timeout: float = 10.0,
+        latency_target: float = 10.0,
+    ) -> None:
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.decreases = 0
+        self.latency_ewma: Optional[float] = None
+        self._last_decrease = -math.inf
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: roughly one call's duration."""
+        return max(1, math.ceil(self.latency_ewma or 1.0))
+
+    def _enter(self, waiter: _Waiter) -> bool:
+        """Take a free slot (True) or queue ``waiter`` (False); raise when the queue is full."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise ConcurrencyLimitExceeded(f"LLM provider {self.name} is at capacity", self.retry_after())
+        self._waiters.append(waiter)
+        return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Drop a waiter that gave up; returns True if a slot was granted to it in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _timed_out(self) -> ConcurrencyLimitExceeded:
+        with self._lock:
+            self.timed_out += 1
+        return ConcurrencyLimitExceeded(f"Timed out waiting for LLM provider {self.name}", self.retry_after())
+
+    def acquire(self) -> None:
+        waiter = _Waiter(event=threading.Event())
+        with self._lock:
+            if self._enter(waiter):
+                return
+        if not waiter.event.wait(self.queue_timeout) and not self._abandon(waiter):
+            raise self._timed_out()
+
+    async def aacquire(self) -> None:
+        waiter = _Waiter(future=asyncio.get_running_loop().create_future())
+        with self._lock:
+            if self._enter(waiter):
+                return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                raise self._timed_out()
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release(Slot())
+            raise
+
+    def release(self, slot: Slot) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if slot.latency is not None:
+                self.latency_ewma = (
+                    slot.latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * slot.latency
+                )
+            if slot.overloaded or (slot.latency is not None and slot.latency > self.latency_target):
+                if now - self._last_decrease >= self.latency_target:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif slot.latency is not None:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self.in_flight -= 1
+            while self._waiters and self.in_flight < int(self.limit):
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                self.in_flight += 1
+                self.admitted += 1
+                waiter.wake()
+
+    @contextmanager
+    def slot(self) -> Iterator[Slot]:
+        self.acquire()
+        slot = Slot()
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[Slot]:
+        await self.aacquire()
+        slot = Slot()
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "decreases": self.decreases,
+            "latency_ewma_seconds": self.latency_ewma,
+        }
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(name: str) -> AdaptiveLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveLimiter(
+                name,
+                initial_limit=settings.LLM_CONCURRENCY_INITIAL,
+                min_limit=settings.LLM_CONCURRENCY_MIN,
+                max_limit=settings.LLM_CONCURRENCY_MAX,
+                max_queue=settings.LLM_QUEUE_SIZE,
+                queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+                latency_target=settings.LLM_LATENCY_TARGET_SECONDS,
+            )
+        return limiter
+
+
+def concurrency_stats() -> Dict[str, Dict[str, object]]:
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
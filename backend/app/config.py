@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -25,6 +26,32 @@ class Settings:
     )
     OPENROUTER_REFERRER: str | None = get_env("OPENROUTER_REFERRER")
     OPENROUTER_TITLE: str | None = get_env("OPENROUTER_TITLE")
+    LLM_MAX_CONNECTIONS: int = int(get_env("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(get_env("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = float(get_env("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+    LLM_HTTP2: bool = get_env("LLM_HTTP2", "false").lower() == "true"
+    LLM_ROUTING: str = get_env("LLM_ROUTING", "latency").lower()
+    LLM_ROUTER_WINDOW: int = int(get_env("LLM_ROUTER_WINDOW", "50"))
+    LLM_ROUTER_MAX_AGE_SECONDS: float = float(get_env("LLM_ROUTER_MAX_AGE_SECONDS", "300"))
+    LLM_HEDGE_ENABLED: bool = get_env("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(get_env("LLM_HEDGE_PERCENTILE", "0.9"))
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = float(get_env("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+    LLM_CONCURRENCY_INITIAL: int = int(get_env("LLM_CONCURRENCY_INITIAL", "20"))
+    LLM_CONCURRENCY_MIN: int = int(get_env("LLM_CONCURRENCY_MIN", "2"))
+    LLM_CONCURRENCY_MAX: int = int(get_env("LLM_CONCURRENCY_MAX", "200"))
+    LLM_QUEUE_SIZE: int = int(get_env("LLM_QUEUE_SIZE", "100"))
+    LLM_QUEUE_TIMEOUT_SECONDS: float = float(get_env("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+    LLM_LATENCY_TARGET_SECONDS: float = float(get_env("LLM_LATENCY_TARGET_SECONDS", "10"))
+    LLM_BREAKER_FAILURE_THRESHOLD: int = int(get_env("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+    LLM_BREAKER_ERROR_RATE: float = float(get_env("LLM_BREAKER_ERROR_RATE", "0.5"))
+    LLM_BREAKER_WINDOW: int = int(get_env("LLM_BREAKER_WINDOW", "20"))
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = float(get_env("LLM_BREAKER_SLOW_CALL_SECONDS", "10"))
+    LLM_BREAKER_OPEN_SECONDS: float = float(get_env("LLM_BREAKER_OPEN_SECONDS", "30"))
+    LLM_BREAKER_HALF_OPEN_CALLS: int = int(get_env("LLM_BREAKER_HALF_OPEN_CALLS", "1"))
+    LLM_CACHE_ENABLED: bool = get_env("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH: str = get_env("LLM_CACHE_PATH", "./llm_cache.sqlite3")
+    LLM_CACHE_TTL_SECONDS: float = float(get_env("LLM_CACHE_TTL_SECONDS", "86400"))
+    LLM_CACHE_MAX_ENTRIES: int = int(get_env("LLM_CACHE_MAX_ENTRIES", "5000"))
     MOCK_MODE: bool = get_env("MOCK_MODE", "false").lower() == "true"
     ALLOWED_ORIGINS: list[str] = (
         get_env(
@@ -34,6 +61,25 @@ class Settings:
     )
     PORT: int = int(get_env("PORT", "8000"))
     MAX_SNIPPETS: int = int(get_env("MAX_SNIPPETS", "5"))
+    KB_REFRESH_SECONDS: float = float(get_env("KB_REFRESH_SECONDS", "5"))
+    KB_SCORER: str = get_env("KB_SCORER", "bm25").lower()
+    KB_SNIPPET_CHAR_BUDGET: int = int(get_env("KB_SNIPPET_CHAR_BUDGET", "2400"))
+    PLAN_RETRIEVAL_MODE: str = get_env("PLAN_RETRIEVAL_MODE", "lexical").lower()
+    CHAT_RETRIEVAL_MODE: str = get_env("CHAT_RETRIEVAL_MODE", "lexical").lower()
+    SEMANTIC_DIMENSIONS: int = int(get_env("SEMANTIC_DIMENSIONS", "4096"))
+    PLAN_PROMPT_TOKEN_BUDGET: int = int(get_env("PLAN_PROMPT_TOKEN_BUDGET", "3000"))
+    CHAT_PROMPT_TOKEN_BUDGET: int = int(get_env("CHAT_PROMPT_TOKEN_BUDGET", "2000"))
+    PLAN_GENERATION_MODE: str = get_env("PLAN_GENERATION_MODE", "single").lower()
+    PLAN_BATCH_MAX_PROFILES: int = int(get_env("PLAN_BATCH_MAX_PROFILES", "500"))
+    PLAN_BATCH_CONCURRENCY: int = int(get_env("PLAN_BATCH_CONCURRENCY", "8"))
+    PLAN_BATCH_GROUPING: str = get_env("PLAN_BATCH_GROUPING", "near").lower()
+    RETRIEVAL_CACHE_SIZE: int = int(get_env("RETRIEVAL_CACHE_SIZE", "1024"))
+    RETRIEVAL_CACHE_TTL_SECONDS: float = float(get_env("RETRIEVAL_CACHE_TTL_SECONDS", "0"))
+    KB_INDEX_PATH: str = get_env("KB_INDEX_PATH", "")
+    KB_INCLUDE_PUBLISHED: bool = get_env("KB_INCLUDE_PUBLISHED", "true").lower() == "true"
+    KB_GENERATION_FILE: str = get_env(
+        "KB_GENERATION_FILE", str(Path(tempfile.gettempdir()) / "visaverse-kb-generation")
+    )
     DATABASE_URL: str = get_env(
         "DATABASE_URL", "sqlite:///./data.sqlite3"
     )
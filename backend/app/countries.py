@@ -0,0 +1,333 @@
+"""Country alias table mapping ISO codes and EN/FR names to a canonical ISO-2 code."""
+
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+# ISO-2 | ISO-3 | English name | French name
+_COUNTRY_TABLE = """
+AD|AND|Andorra|Andorre
+AE|ARE|United Arab Emirates|Émirats arabes unis
+AF|AFG|Afghanistan|Afghanistan
+AG|ATG|Antigua and Barbuda|Antigua-et-Barbuda
+AI|AIA|Anguilla|Anguilla
+AL|ALB|Albania|Albanie
+AM|ARM|Armenia|Arménie
+AO|AGO|Angola|Angola
+AQ|ATA|Antarctica|Antarctique
+AR|ARG|Argentina|Argentine
+AS|ASM|American Samoa|Samoa américaines
+AT|AUT|Austria|Autriche
+AU|AUS|Australia|Australie
+AW|ABW|Aruba|Aruba
+AX|ALA|Åland Islands|Îles Åland
+AZ|AZE|Azerbaijan|Azerbaïdjan
+BA|BIH|Bosnia and Herzegovina|Bosnie-Herzégovine
+BB|BRB|Barbados|Barbade
+BD|BGD|Bangladesh|Bangladesh
+BE|BEL|Belgium|Belgique
+BF|BFA|Burkina Faso|Burkina Faso
+BG|BGR|Bulgaria|Bulgarie
+BH|BHR|Bahrain|Bahreïn
+BI|BDI|Burundi|Burundi
+BJ|BEN|Benin|Bénin
+BL|BLM|Saint Barthélemy|Saint-Barthélemy
+BM|BMU|Bermuda|Bermudes
+BN|BRN|Brunei Darussalam|Brunéi Darussalam
+BO|BOL|Bolivia|Bolivie
+BQ|BES|Bonaire, Sint Eustatius and Saba|Bonaire, Saint-Eustache et Saba
+BR|BRA|Brazil|Brésil
+BS|BHS|Bahamas|Bahamas
+BT|BTN|Bhutan|Bhoutan
+BV|BVT|Bouvet Island|Île Bouvet
+BW|BWA|Botswana|Botswana
+BY|BLR|Belarus|Biélorussie
+BZ|BLZ|Belize|Belize
+CA|CAN|Canada|Canada
+CC|CCK|Cocos (Keeling) Islands|Cocos (Keeling)
+CD|COD|Democratic Republic of the Congo|République démocratique du Congo
+CF|CAF|Central African Republic|République centrafricaine
+CG|COG|Congo|République du Congo
+CH|CHE|Switzerland|Suisse
+CI|CIV|Côte d'Ivoire|Côte d'Ivoire
+CK|COK|Cook Islands|Îles Cook
+CL|CHL|Chile|Chili
+CM|CMR|Cameroon|Cameroun
+CN|CHN|China|Chine
+CO|COL|Colombia|Colombie
+CR|CRI|Costa Rica|Costa Rica
+CU|CUB|Cuba|Cuba
+CV|CPV|Cabo Verde|Cap-Vert
+CW|CUW|Curaçao|Curaçao
+CX|CXR|Christmas Island|Christmas
+CY|CYP|Cyprus|Chypre
+CZ|CZE|Czech Republic|Tchéquie
+DE|DEU|Germany|Allemagne
+DJ|DJI|Djibouti|Djibouti
+DK|DNK|Denmark|Danemark
+DM|DMA|Dominica|Dominique
+DO|DOM|Dominican Republic|République dominicaine
+DZ|DZA|Algeria|Algérie
+EC|ECU|Ecuador|Équateur
+EE|EST|Estonia|Estonie
+EG|EGY|Egypt|Égypte
+EH|ESH|Western Sahara|Sahara occidental
+ER|ERI|Eritrea|Érythrée
+ES|ESP|Spain|Espagne
+ET|ETH|Ethiopia|Éthiopie
+FI|FIN|Finland|Finlande
+FJ|FJI|Fiji|Fidji
+FK|FLK|Falkland Islands (Malvinas)|Malouines
+FM|FSM|Micronesia|Micronésie
+FO|FRO|Faroe Islands|Îles Féroé
+FR|FRA|France|France
+GA|GAB|Gabon|Gabon
+GB|GBR|United Kingdom|Royaume-Uni
+GD|GRD|Grenada|Grenade
+GE|GEO|Georgia|Géorgie
+GF|GUF|French Guiana|Guyane française
+GG|GGY|Guernsey|Guernesey
+GH|GHA|Ghana|Ghana
+GI|GIB|Gibraltar|Gibraltar
+GL|GRL|Greenland|Groënland
+GM|GMB|Gambia|Gambie
+GN|GIN|Guinea|Guinée
+GP|GLP|Guadeloupe|Guadeloupe
+GQ|GNQ|Equatorial Guinea|Guinée Équatoriale
+GR|GRC|Greece|Grèce
+GS|SGS|South Georgia and the South Sandwich Islands|Géorgie du Sud et les îles Sandwich du Sud
+GT|GTM|Guatemala|Guatemala
+GU|GUM|Guam|Guam
+GW|GNB|Guinea-Bissau|Guinée-Bissau
+GY|GUY|Guyana|Guyana
+HK|HKG|Hong Kong|Hong Kong
+HM|HMD|Heard Island and McDonald Islands|Îles Heard-et-MacDonald
+HN|HND|Honduras|Honduras
+HR|HRV|Croatia|Croatie
+HT|HTI|Haiti|Haïti
+HU|HUN|Hungary|Hongrie
+ID|IDN|Indonesia|Indonésie
+IE|IRL|Ireland|Irlande
+IL|ISR|Israel|Israël
+IM|IMN|Isle of Man|Île de Man
+IN|IND|India|Inde
+IO|IOT|British Indian Ocean Territory|Territoire britannique de l'océan Indien
+IQ|IRQ|Iraq|Irak
+IR|IRN|Iran|Iran
+IS|ISL|Iceland|Islande
+IT|ITA|Italy|Italie
+JE|JEY|Jersey|Jersey
+JM|JAM|Jamaica|Jamaïque
+JO|JOR|Jordan|Jordanie
+JP|JPN|Japan|Japon
+KE|KEN|Kenya|Kenya
+KG|KGZ|Kyrgyzstan|Kirghizistan
+KH|KHM|Cambodia|Cambodge
+KI|KIR|Kiribati|Kiribati
+KM|COM|Comoros|Comores
+KN|KNA|Saint Kitts and Nevis|Saint-Christophe-et-Niévès
+KP|PRK|North Korea|Corée du Nord
+KR|KOR|South Korea|Corée du Sud
+KW|KWT|Kuwait|Koweït
+KY|CYM|Cayman Islands|Îles Caïmans
+KZ|KAZ|Kazakhstan|Kazakhstan
+LA|LAO|Laos|Laos
+LB|LBN|Lebanon|Liban
+LC|LCA|Saint Lucia|Sainte-Lucie
+LI|LIE|Liechtenstein|Liechtenstein
+LK|LKA|Sri Lanka|Sri Lanka
+LR|LBR|Liberia|Libéria
+LS|LSO|Lesotho|Lesotho
+LT|LTU|Lithuania|Lituanie
+LU|LUX|Luxembourg|Luxembourg
+LV|LVA|Latvia|Lettonie
+LY|LBY|Libya|Libye
+MA|MAR|Morocco|Maroc
+MC|MCO|Monaco|Monaco
+MD|MDA|Moldova|Moldavie
+ME|MNE|Montenegro|Monténégro
+MF|MAF|Saint Martin|Saint-Martin (partie française)
+MG|MDG|Madagascar|Madagascar
+MH|MHL|Marshall Islands|Îles Marshall
+MK|MKD|North Macedonia|Macédoine du Nord
+ML|MLI|Mali|Mali
+MM|MMR|Myanmar|Myanmar
+MN|MNG|Mongolia|Mongolie
+MO|MAC|Macao|Macau
+MP|MNP|Northern Mariana Islands|Îles Mariannes du Nord
+MQ|MTQ|Martinique|Martinique
+MR|MRT|Mauritania|Mauritanie
+MS|MSR|Montserrat|Montserrat
+MT|MLT|Malta|Malte
+MU|MUS|Mauritius|Maurice
+MV|MDV|Maldives|Maldives
+MW|MWI|Malawi|Malawi
+MX|MEX|Mexico|Mexique
+MY|MYS|Malaysia|Malaisie
+MZ|MOZ|Mozambique|Mozambique
+NA|NAM|Namibia|Namibie
+NC|NCL|New Caledonia|Nouvelle-Calédonie
+NE|NER|Niger|Niger
+NF|NFK|Norfolk Island|Île Norfolk
+NG|NGA|Nigeria|Nigeria
+NI|NIC|Nicaragua|Nicaragua
+NL|NLD|Netherlands|Pays-Bas
+NO|NOR|Norway|Norvège
+NP|NPL|Nepal|Népal
+NR|NRU|Nauru|Nauru
+NU|NIU|Niue|Nioue
+NZ|NZL|New Zealand|Nouvelle-Zélande
+OM|OMN|Oman|Oman
+PA|PAN|Panama|Panama
+PE|PER|Peru|Pérou
+PF|PYF|French Polynesia|Polynésie française
+PG|PNG|Papua New Guinea|Papouasie-Nouvelle-Guinée
+PH|PHL|Philippines|Philippines
+PK|PAK|Pakistan|Pakistan
+PL|POL|Poland|Pologne
+PM|SPM|Saint Pierre and Miquelon|Saint-Pierre-et-Miquelon
+PN|PCN|Pitcairn|Îles Pitcairn
+PR|PRI|Puerto Rico|Porto Rico
+PS|PSE|Palestine|Palestine
+PT|PRT|Portugal|Portugal
+PW|PLW|Palau|Palaos
+PY|PRY|Paraguay|Paraguay
+QA|QAT|Qatar|Qatar
+RE|REU|Réunion|Réunion
+RO|ROU|Romania|Roumanie
+RS|SRB|Serbia|Serbie
+RU|RUS|Russia|Russie
+RW|RWA|Rwanda|Rwanda
+SA|SAU|Saudi Arabia|Arabie saoudite
+SB|SLB|Solomon Islands|Salomon
+SC|SYC|Seychelles|Seychelles
+SD|SDN|Sudan|Soudan
+SE|SWE|Sweden|Suède
+SG|SGP|Singapore|Singapour
+SH|SHN|Saint Helena, Ascension and Tristan da Cunha|Sainte-Hélène, Ascension et Tristan da Cunha
+SI|SVN|Slovenia|Slovénie
+SJ|SJM|Svalbard and Jan Mayen|Svalbard et île Jan Mayen
+SK|SVK|Slovakia|Slovaquie
+SL|SLE|Sierra Leone|Sierra Leone
+SM|SMR|San Marino|Saint-Marin
+SN|SEN|Senegal|Sénégal
+SO|SOM|Somalia|Somalie
+SR|SUR|Suriname|Surinam
+SS|SSD|South Sudan|Soudan du Sud
+ST|STP|Sao Tome and Principe|Sao Tomé-et-Principe
+SV|SLV|El Salvador|Salvador
+SX|SXM|Sint Maarten|Saint-Martin (partie néerlandaise)
+SY|SYR|Syria|Syrie
+SZ|SWZ|Eswatini|Eswatini
+TC|TCA|Turks and Caicos Islands|Îles Turques-et-Caïques
+TD|TCD|Chad|Tchad
+TF|ATF|French Southern Territories|Terres australes françaises
+TG|TGO|Togo|Togo
+TH|THA|Thailand|Thaïlande
+TJ|TJK|Tajikistan|Tadjikistan
+TK|TKL|Tokelau|Tokelau
+TL|TLS|Timor-Leste|Timor oriental
+TM|TKM|Turkmenistan|Turkménistan
+TN|TUN|Tunisia|Tunisie
+TO|TON|Tonga|Tonga
+TR|TUR|Turkey|Turquie
+TT|TTO|Trinidad and Tobago|Trinité-et-Tobago
+TV|TUV|Tuvalu|Tuvalu
+TW|TWN|Taiwan|Taïwan
+TZ|TZA|Tanzania|Tanzanie
+UA|UKR|Ukraine|Ukraine
+UG|UGA|Uganda|Ouganda
+UM|UMI|United States Minor Outlying Islands|Îles mineures éloignées des États-Unis
+US|USA|United States|États-Unis
+UY|URY|Uruguay|Uruguay
+UZ|UZB|Uzbekistan|Ouzbékistan
+VA|VAT|Vatican City|Vatican
+VC|VCT|Saint Vincent and the Grenadines|Saint-Vincent-et-les-Grenadines
+VE|VEN|Venezuela|Venezuela
+VG|VGB|British Virgin Islands|Îles Vierges britanniques
+VI|VIR|U.S. Virgin Islands|Îles Vierges des États-Unis
+VN|VNM|Vietnam|Viêt Nam
+VU|VUT|Vanuatu|Vanuatu
+WF|WLF|Wallis and Futuna|Wallis et Futuna
+WS|WSM|Samoa|Samoa
+YE|YEM|Yemen|Yémen
+YT|MYT|Mayotte|Mayotte
+ZA|ZAF|South Africa|Afrique du Sud
+ZM|ZMB|Zambia|Zambie
+ZW|ZWE|Zimbabwe|Zimbabwe
+"""
+
+# Spellings people and KB authors actually use besides the names above.
+EXTRA_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "AE": ("UAE", "Emirates", "Emirats"),
+    "BO": ("Bolivia, Plurinational State of",),
+    "BY": ("Belarus", "Bélarus"),
+    "CD": ("DRC", "DR Congo", "RDC", "Congo-Kinshasa", "Congo, The Democratic Republic of the"),
+    "CG": ("Republic of the Congo", "Congo-Brazzaville", "Congo"),
+    "CI": ("Ivory Coast",),
+    "CV": ("Cape Verde",),
+    "CZ": ("Czechia", "République tchèque"),
+    "GB": ("UK", "Great Britain", "Britain", "England", "Grande-Bretagne", "Angleterre"),
+    "IR": ("Iran, Islamic Republic of",),
+    "KP": ("Korea, Democratic People's Republic of",),
+    "KR": ("Korea", "Korea, Republic of", "Corée"),
+    "LA": ("Lao People's Democratic Republic",),
+    "MD": ("Moldova, Republic of",),
+    "MK": ("Macedonia", "Macédoine"),
+    "MM": ("Burma", "Birmanie"),
+    "NL": ("Holland", "Hollande"),
+    "PS": ("Palestine, State of",),
+    "RU": ("Russian Federation", "Fédération de Russie"),
+    "SZ": ("Swaziland",),
+    "TR": ("Türkiye", "Turkiye"),
+    "TZ": ("Tanzania, United Republic of",),
+    "US": ("USA", "United States of America", "America", "Amérique", "Etats-Unis d'Amérique"),
+    "VA": ("Holy See", "Vatican"),
+    "VE": ("Venezuela, Bolivarian Republic of",),
+    "VN": ("Viet Nam",),
+}
+
+
+def fold(value: str) -> str:
+    """Case-, accent- and punctuation-insensitive form used for alias lookups."""
+    decomposed = unicodedata.normalize("NFKD", value.strip().lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9]+", " ", stripped).strip()
+
+
+def _build_tables() -> Tuple[Dict[str, Tuple[str, str]], Dict[str, str]]:
+    names: Dict[str, Tuple[str, str]] = {}
+    aliases: Dict[str, str] = {}
+    for line in _COUNTRY_TABLE.strip().splitlines():
+        alpha_2, alpha_3, english, french = line.split("|")
+        names[alpha_2] = (english, french)
+        for alias in (alpha_2, alpha_3, english, french):
+            aliases.setdefault(fold(alias), alpha_2)
+    for alpha_2, extra in EXTRA_ALIASES.items():
+        for alias in extra:
+            aliases.setdefault(fold(alias), alpha_2)
+    return names, aliases
+
+
+COUNTRY_NAMES, COUNTRY_ALIASES = _build_tables()
+
+
+def canonical_country(value: str) -> str:
+    """ISO-2 code for any known code or name; unknown values come back stripped."""
+    return COUNTRY_ALIASES.get(fold(value), value.strip())
+
+
+def country_names(value: str) -> List[str]:
+    """English and French names for a country, or the value itself if unknown."""
+    names = COUNTRY_NAMES.get(canonical_country(value))
+    if not names:
+        return [value]
+    english, french = names
+    return [english] if english == french else [english, french]
+
+
+def country_label(value: str) -> str:
+    """Readable form for prompts, e.g. "Cameroon (CM)"."""
+    code = canonical_country(value)
+    names = COUNTRY_NAMES.get(code)
+    return f"{names[0]} ({code})" if names else value
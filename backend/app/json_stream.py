@@ -0,0 +1,70 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class TopLevelJsonParser:
+    """Incrementally parse one JSON object, returning each top-level member once it is complete.
+
+    Only the nesting depth and string state are tracked while scanning, so the
+    cost is linear in the input; each member value is decoded with ``json.loads``
+    as soon as the ``,`` or ``}`` that ends it arrives. Text before the opening
+    brace (such as a Markdown code fence) is ignored.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        if self.finished:
+            return []
+        self._text += chunk
+        members: List[Tuple[str, Any]] = []
+        text = self._text
+        position = self._position
+        while position < len(text):
+            char = text[position]
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        self._key = json.loads(text[self._key_start : position + 1])
+                        self._key_start = None
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None and self._value_start is None:
+                    self._key_start = position
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]" or (char == "," and self._depth == 1):
+                if self._depth == 1 and self._value_start is not None:
+                    members.append((self._key, json.loads(text[self._value_start : position])))
+                    self._key = None
+                    self._value_start = None
+                    text = text[position + 1 :]
+                    position = -1
+                if char != ",":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self.finished = True
+                        break
+            elif char == ":" and self._depth == 1 and self._key is not None:
+                self._value_start = position + 1
+            position += 1
+        self._text = text
+        self._position = position
+        return members
@@ -1,20 +1,38 @@
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
 
+from sqlalchemy.exc import SQLAlchemyError
+
+from .cache import LruCache
+from .config import settings
+from .countries import canonical_country, country_names
+from .database import session_scope
+from .kb_artifact import KbArtifact
+from .models import KbDocument, KbVersion
+from .ranking import Bm25Index, iter_ranked, query_terms, term_counts
 from .schemas import ProfileIn
+from .semantic import SemanticIndex
 
 
 KB_ROOT = Path(__file__).resolve().parents[2] / "kb"
+logger = logging.getLogger("visaverse")
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+\S")
+ITEM_PATTERN = re.compile(r"^(?:[-*+]|\d+[.)])\s+")
+PUBLISHED_RETRY_SECONDS = 30.0
+PUBLISHED_RETRY_MAX_SECONDS = 600.0
 
 
 class Snippet(dict):
     """Dictionary-based snippet for easy JSON serialization."""
 
 
-def load_markdown_files() -> List[Path]:
-    return list(KB_ROOT.rglob("*.md"))
-
-
 def read_file(path: Path) -> str:
     try:
         return path.read_text(encoding="utf-8")
@@ -38,57 +56,595 @@ def parse_metadata(content: str) -> Tuple[Dict[str, str], str]:
     return metadata, body.strip()
 
 
-def score_content(content: str, profile: ProfileIn) -> int:
-    keywords = [
-        profile.origin_country.lower(),
-        profile.destination_country.lower(),
+def split_sections(content: str) -> List[Tuple[Tuple[str, ...], str]]:
+    """Split a markdown body into heading- and bullet-level sections.
+
+    Each section carries the trail of headings above it so that titles such as
+    "Cameroon to France" still count towards every bullet underneath.
+    """
+    sections: List[Tuple[Tuple[str, ...], str]] = []
+    headings: List[Tuple[int, str]] = []
+    lines: List[str] = []
+
+    def flush() -> None:
+        text = "\n".join(lines).strip()
+        if text:
+            sections.append((tuple(line for _, line in headings), text))
+        lines.clear()
+
+    for line in content.splitlines():
+        stripped = line.strip()
+        heading = HEADING_PATTERN.match(stripped)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, stripped))
+            continue
+        if not stripped or ITEM_PATTERN.match(stripped):
+            flush()
+        if stripped:
+            lines.append(stripped)
+    flush()
+    return sections
+
+
+METADATA_FIELDS = ("origin_country", "destination_country", "purpose", "language")
+MetadataKey = Tuple[str, str, str, str]
+
+
+COUNTRY_FIELDS = ("origin_country", "destination_country")
+
+
+def _metadata_key(metadata: Dict[str, str]) -> MetadataKey:
+    """Bucket key for a document; empty fields act as wildcards."""
+    values = []
+    for field in METADATA_FIELDS:
+        value = metadata.get(field) or ""
+        if value and field in COUNTRY_FIELDS:
+            value = canonical_country(value)
+        values.append(value.lower())
+    return tuple(values)  # type: ignore[return-value]
+
+
+def _profile_keys(profile: ProfileIn) -> List[MetadataKey]:
+    values = (
+        canonical_country(profile.origin_country).lower(),
+        canonical_country(profile.destination_country).lower(),
         profile.purpose.value.lower(),
-    ]
-    return sum(content.lower().count(keyword) for keyword in keywords)
+        profile.language.value.lower(),
+    )
+    return list(itertools.product(*((value, "") for value in values)))
 
 
-def _metadata_matches(metadata: Dict[str, str], profile: ProfileIn) -> bool:
-    if not metadata:
-        return True
-    origin = metadata.get("origin_country")
-    destination = metadata.get("destination_country")
-    purpose = metadata.get("purpose")
-    language = metadata.get("language")
-
-    if origin and origin.lower() != profile.origin_country.lower():
-        return False
-    if destination and destination.lower() != profile.destination_country.lower():
-        return False
-    if purpose and purpose.lower() != profile.purpose.value.lower():
-        return False
-    if language and language.lower() != profile.language.value.lower():
-        return False
-    return True
-
-
-def retrieve_snippets(profile: ProfileIn, k: int = 5) -> List[Snippet]:
-    files = load_markdown_files()
-    scored = []
-    for path in files:
-        raw_content = read_file(path)
+class Chunk:
+    """Heading- or bullet-level section of a KB document, indexed on its own.
+
+    Chunks loaded from a KB index artifact keep only a span into the memory map
+    and decode their text when it is first needed.
+    """
+
+    def __init__(
+        self,
+        document: "IndexedDocument",
+        position: int,
+        headings: Tuple[str, ...],
+        text: str = "",
+        span: Optional[Tuple[KbArtifact, int, int]] = None,
+    ) -> None:
+        self.document = document
+        self.position = position
+        self.headings = headings
+        self._text = text
+        self._span = span
+        self._lowered: Optional[str] = None
+        self._terms: Optional[Counter] = None
+        self.keyword_counts: Dict[str, int] = {}
+
+    @property
+    def text(self) -> str:
+        if self._span is None:
+            return self._text
+        artifact, offset, length = self._span
+        return artifact.text(offset, length)
+
+    @property
+    def lowered(self) -> str:
+        if self._lowered is None:
+            self._lowered = "\n".join(self.headings + (self.text,)).lower()
+        return self._lowered
+
+    @property
+    def terms(self) -> Counter:
+        if self._terms is None:
+            self._terms = term_counts(self.lowered)
+        return self._terms
+
+    def count(self, keyword: str) -> int:
+        count = self.keyword_counts.get(keyword)
+        if count is None:
+            count = self.lowered.count(keyword)
+            self.keyword_counts[keyword] = count
+        return count
+
+    def score(self, keywords: Iterable[str]) -> int:
+        return sum(self.count(keyword) for keyword in keywords)
+
+
+class IndexedDocument:
+    """KB document (markdown file, published version or artifact entry) held in memory."""
+
+    def __init__(
+        self, ref: str, title: str, metadata: Dict[str, str], stamp: object, content: Optional[str] = None
+    ) -> None:
+        self.ref = ref
+        self.title = title
+        self.metadata = metadata
+        self.stamp = stamp
+        self.chunks: List[Chunk] = []
+        self._content = content
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            return _render_chunks(self.chunks)
+        return self._content
+
+    @classmethod
+    def parse(
+        cls,
+        ref: str,
+        title: str,
+        raw_content: str,
+        stamp: object,
+        metadata_overrides: Optional[Dict[str, Optional[str]]] = None,
+    ) -> "IndexedDocument":
         metadata, content = parse_metadata(raw_content)
-        if not _metadata_matches(metadata, profile):
+        for key, value in (metadata_overrides or {}).items():
+            if value:
+                metadata[key] = value
+        document = cls(ref, title, metadata, stamp, content)
+        document.chunks = [
+            Chunk(document, position, headings, text)
+            for position, (headings, text) in enumerate(split_sections(content))
+        ]
+        return document
+
+    @classmethod
+    def from_file(cls, path: Path, root: Path, stat: os.stat_result) -> "IndexedDocument":
+        return cls.parse(
+            str(path.relative_to(root)),
+            path.stem.replace("_", " ").title(),
+            read_file(path),
+            (stat.st_mtime_ns, stat.st_size),
+        )
+
+    @classmethod
+    def from_version(cls, document: KbDocument, version: KbVersion) -> "IndexedDocument":
+        return cls.parse(
+            f"kb_documents/{document.id}@v{version.version}",
+            document.title,
+            version.content or "",
+            version.id,
+            {field: getattr(document, field) for field in METADATA_FIELDS},
+        )
+
+
+class ArtifactPostings(Mapping):
+    """Term -> {chunk: count} backed by an artifact; a term's postings are decoded when first queried."""
+
+    def __init__(self, artifact: KbArtifact, chunks: Sequence[Chunk]) -> None:
+        self._artifact = artifact
+        self._chunks = chunks
+        self._decoded: Dict[str, Dict[Chunk, int]] = {}
+
+    def __getitem__(self, term: str) -> Dict[Chunk, int]:
+        docs = self._decoded.get(term)
+        if docs is None:
+            entries = self._artifact.postings(term)
+            if entries is None:
+                raise KeyError(term)
+            chunks = self._chunks
+            docs = {chunks[chunk_id]: count for chunk_id, count in entries.tolist()}
+            self._decoded[term] = docs
+        return docs
+
+    def __iter__(self) -> Iterator[str]:
+        return self._artifact.terms()
+
+    def __len__(self) -> int:
+        return self._artifact.term_count
+
+
+def load_artifact(path: Path) -> Tuple[List[IndexedDocument], Bm25Index]:
+    """Map a prebuilt index; chunk bodies and postings stay in the mapped file until used."""
+    artifact = KbArtifact(path)
+    documents: List[IndexedDocument] = []
+    chunks: List[Chunk] = []
+    for entry in artifact.documents:
+        document = IndexedDocument(entry["ref"], entry["title"], entry["metadata"], entry["ref"])
+        document.chunks = [
+            Chunk(document, position, tuple(item["headings"]), span=(artifact, item["offset"], item["length"]))
+            for position, item in enumerate(entry["chunks"])
+        ]
+        documents.append(document)
+        chunks.extend(document.chunks)
+    lengths = dict(zip(chunks, artifact.lengths.tolist()))
+    return documents, Bm25Index.from_postings(ArtifactPostings(artifact, chunks), lengths)
+
+
+class KbSnapshot:
+    """Immutable view of the KB; requests read one snapshot and it is swapped whole."""
+
+    def __init__(
+        self, documents: Sequence[IndexedDocument], generation: int, bm25: Optional[Bm25Index] = None
+    ) -> None:
+        self.documents = tuple(documents)
+        self.generation = generation
+        self.chunks = tuple(chunk for document in self.documents for chunk in document.chunks)
+        self.buckets: Dict[MetadataKey, List[IndexedDocument]] = {}
+        for document in self.documents:
+            self.buckets.setdefault(_metadata_key(document.metadata), []).append(document)
+        if bm25 is None:
+            bm25 = Bm25Index((chunk, chunk.terms) for chunk in self.chunks)
+        self.bm25 = bm25
+        self._semantic: Optional[SemanticIndex] = None
+        self._semantic_lock = threading.Lock()
+
+    def candidates(self, profile: ProfileIn) -> List[Chunk]:
+        """Chunks whose document metadata matches the profile, resolved by bucket lookups."""
+        matches: List[Chunk] = []
+        for key in _profile_keys(profile):
+            for document in self.buckets.get(key, ()):
+                matches.extend(document.chunks)
+        return matches
+
+    def build_semantic(self, previous: Optional[SemanticIndex] = None) -> None:
+        """Build the TF-IDF index now, reusing the feature counts of chunks ``previous`` already has."""
+        self._semantic = SemanticIndex(
+            self.chunks, lambda chunk: chunk.lowered, dimensions=settings.SEMANTIC_DIMENSIONS, previous=previous
+        )
+
+    def semantic(self) -> SemanticIndex:
+        """TF-IDF vectors for every chunk; built at swap when a retrieval mode is semantic, else on first use."""
+        if self._semantic is None:
+            with self._semantic_lock:
+                if self._semantic is None:
+                    self.build_semantic()
+        return self._semantic  # type: ignore[return-value]
+
+
+def load_published_documents() -> List[IndexedDocument]:
+    with session_scope() as session:
+        rows = (
+            session.query(KbDocument, KbVersion)
+            .join(KbVersion, KbDocument.current_version_id == KbVersion.id)
+            .order_by(KbDocument.id)
+            .all()
+        )
+        return [IndexedDocument.from_version(document, version) for document, version in rows]
+
+
+def read_generation(path: Path) -> str:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_generation(path: Path) -> str:
+    """Stamp the shared generation file so every worker reloads published content."""
+    token = str(time.time_ns())
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temp_path.write_text(token, encoding="utf-8")
+    os.replace(temp_path, path)
+    return token
+
+
+class KbIndex:
+    """Process-wide KB snapshot built from markdown files and published versions.
+
+    Markdown files are re-scanned at most once every ``refresh_interval`` seconds
+    and only files whose mtime or size changed are parsed again. When
+    ``artifact_path`` points at a prebuilt index it replaces the file scan and
+    is only re-mapped when the artifact itself changes. Published versions are
+    reloaded from the database only when the shared generation file changes,
+    so regular requests never query the database.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        refresh_interval: float = 0.0,
+        generation_file: Optional[Path] = None,
+        include_published: bool = False,
+        artifact_path: Optional[Path] = None,
+        cache_size: int = 0,
+        cache_ttl: float = 0.0,
+    ) -> None:
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.generation_file = generation_file
+        self.include_published = include_published
+        self.artifact_path = artifact_path
+        self._files: Dict[Path, IndexedDocument] = {}
+        self._artifact_stamp: Optional[Tuple[int, int]] = None
+        self._artifact_bm25: Optional[Bm25Index] = None
+        self._published: List[IndexedDocument] = []
+        self._published_generation: Optional[str] = None
+        self._published_failures = 0
+        self._published_retry_at = 0.0
+        self._failed_generation: Optional[str] = None
+        self._snapshot = KbSnapshot((), 0)
+        self.retrieval_cache = LruCache(cache_size, ttl=cache_ttl)
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def snapshot(self) -> KbSnapshot:
+        self.refresh()
+        return self._snapshot
+
+    def documents(self) -> Tuple[IndexedDocument, ...]:
+        return self.snapshot().documents
+
+    def candidates(self, profile: ProfileIn) -> List[Chunk]:
+        return self.snapshot().candidates(profile)
+
+    def refresh(self, force: bool = False) -> None:
+        if not force and self._is_fresh():
+            return
+        # Only one thread rebuilds; the others keep serving the current snapshot.
+        if not self._lock.acquire(blocking=force or self._checked_at is None):
+            return
+        try:
+            if not force and self._is_fresh():
+                return
+            files_changed = self._map_artifact() if self.artifact_path else self._scan_files()
+            published_changed = self._sync_published(force)
+            if files_changed or published_changed:
+                self._swap()
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def publish(self) -> None:
+        """Reload published versions now and signal other workers to follow."""
+        if not self.include_published:
+            return
+        with self._lock:
+            token = bump_generation(self.generation_file) if self.generation_file else ""
+            if self._load_published(token):
+                self._swap()
+
+    def _is_fresh(self) -> bool:
+        if self._checked_at is None:
+            return False
+        return time.monotonic() - self._checked_at < self.refresh_interval
+
+    def _scan_files(self) -> bool:
+        current: Dict[Path, IndexedDocument] = {}
+        changed = False
+        for path in sorted(self.root.rglob("*.md")):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            existing = self._files.get(path)
+            if existing and existing.stamp == (stat.st_mtime_ns, stat.st_size):
+                current[path] = existing
+                continue
+            current[path] = IndexedDocument.from_file(path, self.root, stat)
+            changed = True
+        changed = changed or current.keys() != self._files.keys()
+        self._files = current
+        return changed
+
+    def _map_artifact(self) -> bool:
+        stat = self.artifact_path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._artifact_stamp:
+            return False
+        documents, self._artifact_bm25 = load_artifact(self.artifact_path)
+        self._files = {Path(document.ref): document for document in documents}
+        self._artifact_stamp = stamp
+        return True
+
+    def _sync_published(self, force: bool) -> bool:
+        if not self.include_published:
+            return False
+        token = read_generation(self.generation_file) if self.generation_file else ""
+        if not force and token == self._published_generation:
+            return False
+        # A new publish (token change) retries at once; otherwise wait out the backoff.
+        if not force and token == self._failed_generation and time.monotonic() < self._published_retry_at:
+            return False
+        return self._load_published(token)
+
+    def _load_published(self, token: str) -> bool:
+        try:
+            self._published = load_published_documents()
+        except SQLAlchemyError:
+            # Back off (doubling, capped) so a missing table or unreachable DB is not queried on every refresh.
+            self._published_failures += 1
+            delay = min(PUBLISHED_RETRY_SECONDS * 2 ** (self._published_failures - 1), PUBLISHED_RETRY_MAX_SECONDS)
+            self._published_retry_at = time.monotonic() + delay
+            self._failed_generation = token
+            logger.warning("kb_published_load_failed", extra={"retry_in_seconds": delay}, exc_info=True)
+            return False
+        self._published_failures = 0
+        self._published_retry_at = 0.0
+        self._published_generation = token
+        return True
+
+    def _swap(self) -> None:
+        published_titles = {document.title for document in self._published}
+        documents: List[IndexedDocument] = []
+        replaced: List[Chunk] = []
+        for document in self._files.values():
+            if document.title in published_titles:
+                replaced.extend(document.chunks)
+            else:
+                documents.append(document)
+        documents.extend(self._published)
+        bm25 = None
+        if self.artifact_path and self._artifact_bm25 is not None:
+            bm25 = self._artifact_bm25
+            if self._published:
+                added = ((chunk, chunk.terms) for document in self._published for chunk in document.chunks)
+                bm25 = bm25.merged(added, replaced)
+        snapshot = KbSnapshot(documents, self._snapshot.generation + 1, bm25)
+        if "semantic" in (settings.PLAN_RETRIEVAL_MODE, settings.CHAT_RETRIEVAL_MODE):
+            # Built by the refreshing thread before the swap so no request pays for it.
+            snapshot.build_semantic(self._snapshot._semantic)
+        self._snapshot = snapshot
+        self.retrieval_cache.clear()
+
+
+kb_index = KbIndex(
+    KB_ROOT,
+    refresh_interval=settings.KB_REFRESH_SECONDS,
+    generation_file=Path(settings.KB_GENERATION_FILE),
+    include_published=settings.KB_INCLUDE_PUBLISHED,
+    artifact_path=Path(settings.KB_INDEX_PATH) if settings.KB_INDEX_PATH else None,
+    cache_size=settings.RETRIEVAL_CACHE_SIZE,
+    cache_ttl=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+)
+
+
+def _country_text(profile: ProfileIn) -> str:
+    # KB text names countries ("Cameroon", "Sénégal"), never by ISO code.
+    return " ".join(country_names(profile.origin_country) + country_names(profile.destination_country))
+
+
+def _profile_terms(profile: ProfileIn) -> List[str]:
+    return query_terms(f"{_country_text(profile)} {profile.purpose.value}")
+
+
+def _profile_keywords(profile: ProfileIn) -> List[str]:
+    return [
+        country_names(profile.origin_country)[0].lower(),
+        country_names(profile.destination_country)[0].lower(),
+        profile.purpose.value.lower(),
+    ]
+
+
+def _profile_query(profile: ProfileIn) -> str:
+    return " ".join([_country_text(profile), profile.purpose.value, profile.notes or ""])
+
+
+def _select_chunks(
+    scores: Dict[Chunk, float], k: int, char_budget: int
+) -> Dict[IndexedDocument, List[Tuple[Chunk, float]]]:
+    """Take the best chunks, from at most ``k`` documents, until the budget is spent."""
+    selected: Dict[IndexedDocument, List[Tuple[Chunk, float]]] = {}
+    remaining = char_budget
+    for chunk, score in iter_ranked(scores):
+        if score <= 0:
+            break
+        document = chunk.document
+        if document not in selected and len(selected) >= k:
             continue
-        score = score_content(content, profile)
-        scored.append((score, path, content, metadata))
-    scored.sort(key=lambda item: item[0], reverse=True)
-    top = [item for item in scored if item[0] > 0][:k]
+        size = len(chunk.text)
+        if char_budget and size > remaining:
+            if selected:
+                continue
+            chunk = Chunk(document, chunk.position, chunk.headings, chunk.text[:remaining].rsplit(" ", 1)[0])
+            size = remaining
+        selected.setdefault(document, []).append((chunk, score))
+        remaining -= size
+        if char_budget and remaining <= 0:
+            break
+    return selected
+
+
+def _render_chunks(chunks: List[Chunk]) -> str:
+    lines: List[str] = []
+    emitted: set = set()
+    for chunk in sorted(chunks, key=lambda item: item.position):
+        for heading in chunk.headings:
+            if heading not in emitted:
+                emitted.add(heading)
+                lines.append(heading)
+        lines.append(chunk.text)
+    return "\n".join(lines)
+
+
+def retrieve_snippets(
+    profile: ProfileIn, k: int = 5, index: Optional[KbIndex] = None, mode: str = "lexical"
+) -> List[Snippet]:
+    """Best KB chunks for a profile; ``mode`` is "lexical" (KB_SCORER) or "semantic".
+
+    Results are cached per normalised profile and ``k`` for the current KB
+    generation, so a KB change never serves stale snippets.
+    """
+    index = index or kb_index
+    snapshot = index.snapshot()
+    cache = index.retrieval_cache
+    if cache.maxsize <= 0:
+        return _retrieve(snapshot, profile, None, k, mode)
+    key = (snapshot.generation, _profile_cache_key(profile, mode), k)
+    snippets = cache.get(key)
+    if snippets is None:
+        snippets = _retrieve(snapshot, profile, None, k, mode)
+        cache.set(key, snippets)
+    return list(snippets)
+
+
+def retrieve_for_query(
+    message: str,
+    profile: Optional[ProfileIn] = None,
+    k: int = 5,
+    index: Optional[KbIndex] = None,
+    mode: str = "lexical",
+) -> List[Snippet]:
+    """Best KB chunks for a free-text question, filtered by the profile when one is given."""
+    return _retrieve((index or kb_index).snapshot(), profile, message, k, mode)
+
+
+def _profile_cache_key(profile: ProfileIn, mode: str) -> Tuple[object, ...]:
+    return (
+        mode,
+        settings.KB_SCORER,
+        settings.KB_SNIPPET_CHAR_BUDGET,
+        canonical_country(profile.origin_country),
+        canonical_country(profile.destination_country),
+        profile.purpose.value,
+        profile.language.value,
+        # Notes only feed the semantic query; keep them out of lexical keys.
+        profile.notes if mode == "semantic" else None,
+    )
+
+
+def _retrieve(
+    snapshot: KbSnapshot, profile: Optional[ProfileIn], message: Optional[str], k: int, mode: str
+) -> List[Snippet]:
+    candidates = snapshot.candidates(profile) if profile else None
+    if mode == "semantic":
+        query = " ".join(filter(None, [message, _profile_query(profile) if profile else None]))
+        scores: Dict[Chunk, float] = snapshot.semantic().scores(query, candidates)
+    elif settings.KB_SCORER == "keyword":
+        keywords = (_profile_keywords(profile) if profile else []) + (query_terms(message) if message else [])
+        scores = {chunk: chunk.score(keywords) for chunk in (snapshot.chunks if candidates is None else candidates)}
+    else:
+        terms = (_profile_terms(profile) if profile else []) + (query_terms(message) if message else [])
+        scores = snapshot.bm25.scores(terms, candidates)
+    selected = _select_chunks(scores, k, settings.KB_SNIPPET_CHAR_BUDGET)
 
     snippets: List[Snippet] = []
-    for score, path, content, metadata in top:
+    for document, chunks in selected.items():
         snippets.append(
             Snippet(
                 {
-                    "title": path.stem.replace("_", " ").title(),
-                    "ref": str(path.relative_to(KB_ROOT)),
-                    "content": content,
-                    "metadata": metadata,
-                    "score": score,
+                    "title": document.title,
+                    "ref": document.ref,
+                    "content": _render_chunks([chunk for chunk, _ in chunks]),
+                    "metadata": document.metadata,
+                    "score": chunks[0][1],
                 }
             )
         )
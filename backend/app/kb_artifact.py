@@ -0,0 +1,146 @@
+"""Binary KB index artifact: a small JSON directory followed by fixed binary sections.
+
+Layout: ``MAGIC`` + little-endian uint64 directory length, the UTF-8 JSON
+directory (documents, chunk offsets and section sizes) padded to 8 bytes, then
+little-endian uint32 sections: term offsets, the sorted UTF-8 term blob
+(padded to 4 bytes), posting offsets, ``(chunk, count)`` posting pairs and
+chunk lengths, followed by the concatenated UTF-8 chunk bodies.
+
+Only the directory is parsed at load time. Terms are found by binary search
+over the mapped dictionary and their postings are sliced out of the map on
+demand, so load cost does not grow with the vocabulary.
+"""
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+MAGIC = b"VVKBIDX2"
+FORMAT_VERSION = 2
+UINT32 = np.dtype("<u4")
+_PREFIX_SIZE = len(MAGIC) + 8
+
+
+def _padding(size: int, alignment: int) -> bytes:
+    return b"\0" * (-size % alignment)
+
+
+def write_artifact(path: Path, documents: List[dict], postings: Dict[str, List[List[int]]], lengths: List[int]) -> None:
+    """Write documents shaped as ``{ref, title, metadata, chunks: [{headings, text}]}``.
+
+    ``postings`` and ``lengths`` refer to chunks by their position across all
+    documents, in the order they are given.
+    """
+    body = bytearray()
+    directory_documents = []
+    for document in documents:
+        chunks = []
+        for chunk in document["chunks"]:
+            encoded = chunk["text"].encode("utf-8")
+            chunks.append({"headings": list(chunk["headings"]), "offset": len(body), "length": len(encoded)})
+            body += encoded
+        directory_documents.append({**document, "chunks": chunks})
+
+    # Sorted by encoded bytes so lookups can compare raw slices of the map.
+    terms = sorted((term.encode("utf-8"), term) for term in postings)
+    term_offsets = [0]
+    posting_offsets = [0]
+    pairs: List[List[int]] = []
+    for encoded, term in terms:
+        term_offsets.append(term_offsets[-1] + len(encoded))
+        pairs.extend(postings[term])
+        posting_offsets.append(len(pairs))
+    term_blob = b"".join(encoded for encoded, _ in terms)
+
+    directory = json.dumps(
+        {
+            "version": FORMAT_VERSION,
+            "documents": directory_documents,
+            "term_count": len(terms),
+            "term_bytes": len(term_blob),
+            "posting_count": len(pairs),
+            "chunk_count": len(lengths),
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    directory += _padding(_PREFIX_SIZE + len(directory), 8)
+
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with temp_path.open("wb") as handle:
+        handle.write(MAGIC)
+        handle.write(len(directory).to_bytes(8, "little"))
+        handle.write(directory)
+        handle.write(np.asarray(term_offsets, dtype=UINT32).tobytes())
+        handle.write(term_blob + _padding(len(term_blob), 4))
+        handle.write(np.asarray(posting_offsets, dtype=UINT32).tobytes())
+        handle.write(np.asarray(pairs, dtype=UINT32).reshape(-1, 2).tobytes())
+        handle.write(np.asarray(lengths, dtype=UINT32).tobytes())
+        handle.write(body)
+    os.replace(temp_path, path)
+
+
+class KbArtifact:
+    """Read-only memory map of a built index; forked workers share its pages."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a KB index artifact")
+        directory_length = int.from_bytes(self._mmap[len(MAGIC) : _PREFIX_SIZE], "little")
+        offset = _PREFIX_SIZE + directory_length
+        directory = json.loads(self._mmap[_PREFIX_SIZE:offset].rstrip(b"\0"))
+        if directory.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported KB index artifact version in {path}")
+        self.documents: List[dict] = directory["documents"]
+        self.term_count: int = directory["term_count"]
+        term_bytes = directory["term_bytes"]
+        posting_count = directory["posting_count"]
+        chunk_count = directory["chunk_count"]
+
+        self._term_offsets = self._uint32(offset, self.term_count + 1)
+        offset += self._term_offsets.nbytes
+        self._terms_start = offset
+        offset += term_bytes + len(_padding(term_bytes, 4))
+        self._posting_offsets = self._uint32(offset, self.term_count + 1)
+        offset += self._posting_offsets.nbytes
+        self._postings = self._uint32(offset, posting_count * 2).reshape(-1, 2)
+        offset += self._postings.nbytes
+        self.lengths = self._uint32(offset, chunk_count)
+        offset += self.lengths.nbytes
+        self._body = memoryview(self._mmap)[offset:]
+
+    def _uint32(self, offset: int, count: int) -> np.ndarray:
+        return np.frombuffer(self._mmap, dtype=UINT32, count=count, offset=offset)
+
+    def _term(self, position: int) -> bytes:
+        start = self._terms_start + int(self._term_offsets[position])
+        end = self._terms_start + int(self._term_offsets[position + 1])
+        return self._mmap[start:end]
+
+    def terms(self) -> Iterator[str]:
+        for position in range(self.term_count):
+            yield self._term(position).decode("utf-8")
+
+    def postings(self, term: str) -> Optional[np.ndarray]:
+        """``(chunk, count)`` rows for ``term`` as a view into the map, or None if it is not indexed."""
+        key = term.encode("utf-8")
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.term_count or self._term(low) != key:
+            return None
+        return self._postings[int(self._posting_offsets[low]) : int(self._posting_offsets[low + 1])]
+
+    def text(self, offset: int, length: int) -> str:
+        return str(self._body[offset : offset + length], "utf-8")
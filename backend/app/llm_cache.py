@@ -0,0 +1,197 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config import settings
+
+
+def cache_key(payload: dict) -> str:
+    """SHA-256 of the fields that determine a completion: model, messages, temperature, response_format."""
+    material = {
+        "model": payload.get("model"),
+        "messages": payload.get("messages"),
+        "temperature": payload.get("temperature"),
+        "response_format": payload.get("response_format"),
+    }
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LlmResponseCache:
+    """SQLite-backed completion cache with TTL and least-recently-used eviction.
+
+    The database file is shared by every worker on the host (WAL mode lets
+    readers proceed while one worker writes) and survives restarts. Hit/miss
+    counters are per process.
+
+    Hits do not write: access times are buffered and flushed in one
+    transaction on the next ``set``, after ``touch_batch`` hits or after
+    ``touch_interval`` seconds, so reads never wait on the writer lock. Any
+    SQLite error (such as "database is locked") is counted and treated as a
+    miss or a skipped write; the cache must never fail an LLM call.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = 86400.0,
+        max_entries: int = 5000,
+        enabled: bool = True,
+        touch_batch: int = 64,
+        touch_interval: float = 30.0,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled and max_entries > 0
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._touched: Dict[str, float] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS llm_responses_accessed ON llm_responses (accessed_at)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _flush_touches(self, connection: sqlite3.Connection) -> None:
+        if self._touched:
+            connection.executemany(
+                "UPDATE llm_responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+        self._last_flush = time.monotonic()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                response, created_at = row
+                if self.ttl and now - created_at > self.ttl:
+                    connection.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    connection.commit()
+                    self._touched.pop(key, None)
+                    self.evictions += 1
+                    self.misses += 1
+                    return None
+            except sqlite3.Error:
+                self.errors += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch or time.monotonic() - self._last_flush >= self.touch_interval:
+                try:
+                    self._flush_touches(connection)
+                    connection.commit()
+                except sqlite3.Error:
+                    # Keep the buffered access times for the next flush; the hit itself is still good.
+                    self.errors += 1
+                    self._last_flush = time.monotonic()
+                    if connection.in_transaction:
+                        connection.rollback()
+            return response
+
+    def set(self, key: str, response: str) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                # Pending access times first, so eviction below sees true recency.
+                self._flush_touches(connection)
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+                overflow = connection.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    connection.execute(
+                        "DELETE FROM llm_responses WHERE key IN"
+                        " (SELECT key FROM llm_responses ORDER BY accessed_at LIMIT ?)",
+                        (overflow,),
+                    )
+                    self.evictions += overflow
+                connection.commit()
+            except sqlite3.Error:
+                self.errors += 1
+                if self._connection is not None and self._connection.in_transaction:
+                    self._connection.rollback()
+
+    def clear(self) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM llm_responses")
+            connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._flush_touches(self._connection)
+                    self._connection.commit()
+                except sqlite3.Error:
+                    self.errors += 1
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        lookups = self.hits + self.misses
+        size = None
+        if self.enabled:
+            with self._lock:
+                try:
+                    size = self._connect().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+                except sqlite3.Error:
+                    self.errors += 1
+        return {
+            "enabled": self.enabled,
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+llm_response_cache = LlmResponseCache(
+    Path(settings.LLM_CACHE_PATH),
+    ttl=settings.LLM_CACHE_TTL_SECONDS,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    enabled=settings.LLM_CACHE_ENABLED,
+)
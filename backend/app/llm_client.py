@@ -1,13 +1,34 @@
+import asyncio
 import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
 
 import httpx
+from pydantic import TypeAdapter
 
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from .concurrency import ConcurrencyLimitExceeded, get_concurrency_limiter
 from .config import settings
+from .llm_cache import cache_key, llm_response_cache
+from .llm_router import Provider, configured_providers, llm_router
 from .prompts import build_prompt
-from .schemas import PlanOut, ProfileIn, RiskItem, SourceRef
+from .schemas import (
+    ChecklistItem,
+    DocumentCategory,
+    LanguageEnum,
+    PlanOut,
+    ProfileIn,
+    RiskItem,
+    SourceRef,
+    Summary,
+    TimelineItem,
+)
 
+logger = logging.getLogger("visaverse")
 
 MOCK_SUMMARY = {
     "title": "Visa preparation plan",
@@ -233,8 +254,61 @@ def _mock_risks(language: str) -> List[dict]:
     ]
 
 
-def build_mock_plan(profile: ProfileIn, snippets: list[dict]) -> PlanOut:
+class MockPlanTemplate:
+    """Language-specific mock plan body, validated once and kept only as immutable JSON bytes.
+
+    Only sources, rule risks and ``generated_at`` change per request. No model
+    objects are retained, so every rendered plan owns its nested data and a
+    caller mutating one response cannot affect the next.
+    """
+
+    def __init__(self, language: str) -> None:
+        plan = PlanOut(
+            summary=MOCK_SUMMARY_FR if language == "FR" else MOCK_SUMMARY,
+            timeline=_mock_timeline(language),
+            checklist=_mock_checklist(language),
+            documents=_mock_documents(language),
+            risks=_mock_risks(language),
+            sources=[],
+            generated_at="",
+        )
+        static = plan.model_dump_json(include={"summary", "timeline", "checklist", "documents"})
+        self.prefix = static[:-1].encode() + b',"risks":['
+        self.risks = _RISKS_ADAPTER.dump_json(plan.risks)[1:-1]
+
+    def render(self, sources: List[SourceRef], generated_at: str) -> PlanOut:
+        """A fresh ``PlanOut`` parsed from the template bytes (no objects shared with other renders)."""
+        return PlanOut.model_validate_json(self.render_json(sources, [], generated_at))
+
+    def render_json(self, sources: List[SourceRef], rule_risks: List[RiskItem], generated_at: str) -> bytes:
+        """The ``PlanOut`` JSON for this template, written without building or validating a model."""
+        risks = self.risks
+        if rule_risks:
+            risks += b"," + _RISKS_ADAPTER.dump_json(rule_risks)[1:-1]
+        return b"".join(
+            (
+                self.prefix,
+                risks,
+                b'],"sources":',
+                _SOURCES_ADAPTER.dump_json(sources),
+                b',"generated_at":',
+                json.dumps(generated_at).encode(),
+                b"}",
+            )
+        )
+
+
+_RISKS_ADAPTER = TypeAdapter(List[RiskItem])
+_SOURCES_ADAPTER = TypeAdapter(List[SourceRef])
+MOCK_PLAN_TEMPLATES = {language.value: MockPlanTemplate(language.value) for language in LanguageEnum}
+
+
+def _mock_template(profile: ProfileIn) -> MockPlanTemplate:
     language = profile.language.value if hasattr(profile.language, "value") else str(profile.language)
+    return MOCK_PLAN_TEMPLATES.get(language, MOCK_PLAN_TEMPLATES["EN"])
+
+
+def mock_sources(snippets: list[dict]) -> List[SourceRef]:
     base_sources = [
         SourceRef(title=s.get("title", ""), ref=s.get("ref", "")) for s in snippets
     ]
@@ -242,52 +316,133 @@ def build_mock_plan(profile: ProfileIn, snippets: list[dict]) -> PlanOut:
         base_sources = [
             SourceRef(title="VisaVerse global guidance", ref="kb/global_documents.md")
         ]
-    summary = MOCK_SUMMARY_FR if language == "FR" else MOCK_SUMMARY
-    model = PlanOut(
-        summary=summary,
-        timeline=_mock_timeline(language),
-        checklist=_mock_checklist(language),
-        documents=_mock_documents(language),
-        risks=_mock_risks(language),
-        sources=base_sources,
-        generated_at=datetime.utcnow().isoformat(),
-    )
-    return model
+    return base_sources
 
 
-def _resolve_llm_transport() -> Tuple[str, dict, str]:
-    if settings.OPENROUTER_API_KEY:
-        headers = {
-            "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        if settings.OPENROUTER_REFERRER:
-            headers["HTTP-Referer"] = settings.OPENROUTER_REFERRER
-        if settings.OPENROUTER_TITLE:
-            headers["X-Title"] = settings.OPENROUTER_TITLE
-        model = settings.OPENROUTER_MODEL or "openai/gpt-4o-mini"
-        return settings.OPENROUTER_BASE_URL, headers, model
-    if settings.OPENAI_API_KEY:
-        headers = {
-            "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-            "Content-Type": "application/json",
+def build_mock_plan(profile: ProfileIn, snippets: list[dict]) -> PlanOut:
+    return _mock_template(profile).render(mock_sources(snippets), datetime.utcnow().isoformat())
+
+
+def mock_plan_json(profile: ProfileIn, sources: List[SourceRef], rule_risks: List[RiskItem]) -> bytes:
+    return _mock_template(profile).render_json(sources, rule_risks, datetime.utcnow().isoformat())
+
+
+class ConnectionStats:
+    """Counts LLM requests against newly opened TCP connections to show keep-alive reuse."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+
+    async def atrace(self, event_name: str, info: dict) -> None:
+        self.trace(event_name, info)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_rate": reused / self.requests if self.requests else None,
         }
-        model = settings.LLM_PROVIDER or "gpt-4o-mini"
-        return "https://api.openai.com/v1/chat/completions", headers, model
-    raise RuntimeError("LLM credentials are not configured.")
 
 
-def call_llm(
-    prompt: str,
-    *,
-    system_prompt: str,
-    temperature: float = 0.2,
-    response_format: dict | None = None,
-    timeout: float = 30.0,
-) -> str:
-    url, headers, model = _resolve_llm_transport()
+connection_stats = ConnectionStats()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_http_client_lock = threading.Lock()
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _use_http2() -> bool:
+    """``LLM_HTTP2`` only if the ``h2`` package is installed; otherwise log why and stay on HTTP/1.1."""
+    if not settings.LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.error(
+            "llm_http2_unavailable",
+            extra={"reason": "LLM_HTTP2=true but the h2 package is missing; install httpx[http2]. Using HTTP/1.1."},
+        )
+        return False
+    return True
+
+
+def open_http_client() -> httpx.Client:
+    """Create the shared keep-alive client; called at app startup, or lazily on first use."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(limits=_pool_limits(), http2=_use_http2(), timeout=30.0)
+        return _http_client
+
+
+def open_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of ``open_http_client``; must be opened on the serving event loop."""
+    global _async_http_client
+    with _http_client_lock:
+        if _async_http_client is None or _async_http_client.is_closed:
+            _async_http_client = httpx.AsyncClient(limits=_pool_limits(), http2=_use_http2(), timeout=30.0)
+        return _async_http_client
+
+
+def close_http_client() -> None:
+    global _http_client
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
+
+async def aclose_http_client() -> None:
+    global _async_http_client
+    with _http_client_lock:
+        client, _async_http_client = _async_http_client, None
+    if client is not None:
+        await client.aclose()
+
+
+def get_http_client() -> httpx.Client:
+    client = _http_client
+    if client is None or client.is_closed:
+        client = open_http_client()
+    return client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    client = _async_http_client
+    if client is None or client.is_closed:
+        client = open_async_http_client()
+    return client
+
+
+def _route() -> List[Provider]:
+    providers = llm_router.ranked(configured_providers())
+    if not providers:
+        raise RuntimeError("LLM credentials are not configured.")
+    return providers
+
+
+def _chat_payload(prompt: str, system_prompt: str, temperature: float, response_format: dict | None) -> dict:
     payload = {
-        "model": model,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt},
@@ -296,28 +451,398 @@ def call_llm(
     }
     if response_format:
         payload["response_format"] = response_format
+    return payload
+
+
+def _cache_key(payload: dict) -> str:
+    # Any configured model may answer a routed request, so the key names the whole configured set.
+    # Routing drops providers with an open circuit; keying on that subset would miss during outages.
+    return cache_key({**payload, "model": "|".join(sorted(provider.model for provider in configured_providers()))})
+
+
+def _check_circuit(provider: Provider) -> None:
+    """Fail fast on an open circuit before queueing for a limiter slot.
+
+    Slots may all be held by calls stuck on the degraded provider; waiting for
+    one would turn the immediate mock fallback into a queue timeout and a 429.
+    This check reserves nothing; ``_acquire_circuit`` takes the half-open probe.
+    """
+    breaker = get_circuit_breaker(provider.name)
+    # ``allow`` is only reached while open, where it just counts the rejection.
+    if not breaker.available() and not breaker.allow():
+        raise CircuitOpenError(f"LLM provider {breaker.name} is unavailable (circuit open)")
+
+
+def _acquire_circuit(provider: Provider) -> CircuitBreaker:
+    """Fail fast while the provider's circuit is open so callers fall back immediately."""
+    breaker = get_circuit_breaker(provider.name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"LLM provider {breaker.name} is unavailable (circuit open)")
+    return breaker
+
+
+def _record_outcome(provider: Provider, breaker: CircuitBreaker, start: float, ok: bool) -> float:
+    elapsed = time.perf_counter() - start
+    llm_router.record(provider, elapsed, ok)
+    if ok:
+        breaker.record_success(elapsed)
+    else:
+        breaker.record_failure()
+    return elapsed
+
+
+def _is_overload(exc: Exception) -> bool:
+    """Provider back-pressure: a 429 or a timeout, as opposed to a plain error."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429
+    return isinstance(exc, httpx.TimeoutException)
+
+
+def _completion_content(response: httpx.Response) -> str:
+    response.raise_for_status()
+    content = response.json()
+    return content.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+
+def _post(provider: Provider, payload: dict, timeout: float) -> str:
+    _check_circuit(provider)
+    with get_concurrency_limiter(provider.name).slot() as slot:
+        breaker = _acquire_circuit(provider)
+        connection_stats.record_request()
+        start = time.perf_counter()
+        try:
+            response = get_http_client().post(
+                provider.url,
+                json={"model": provider.model, **payload},
+                headers=provider.headers,
+                timeout=timeout,
+                extensions={"trace": connection_stats.trace},
+            )
+            answer = _completion_content(response)
+        except Exception as exc:
+            slot.overloaded = _is_overload(exc)
+            _record_outcome(provider, breaker, start, ok=False)
+            raise
+        slot.latency = _record_outcome(provider, breaker, start, ok=True)
+        return answer
 
-    with httpx.Client(timeout=timeout) as client:
-        response = client.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        content = response.json()
-        return content.get("choices", [{}])[0].get("message", {}).get("content", "")
 
+async def _apost(provider: Provider, payload: dict, timeout: float) -> str:
+    _check_circuit(provider)
+    async with get_concurrency_limiter(provider.name).aslot() as slot:
+        breaker = _acquire_circuit(provider)
+        connection_stats.record_request()
+        start = time.perf_counter()
+        try:
+            response = await get_async_http_client().post(
+                provider.url,
+                json={"model": provider.model, **payload},
+                headers=provider.headers,
+                timeout=timeout,
+                extensions={"trace": connection_stats.atrace},
+            )
+            answer = _completion_content(response)
+        except asyncio.CancelledError:
+            # A hedge race loser took at least this long; without the sample a slow provider
+            # would stay unmeasured, keep ranking first and get every call hedged. Not a failure.
+            llm_router.record(provider, time.perf_counter() - start, ok=True)
+            raise
+        except Exception as exc:
+            slot.overloaded = _is_overload(exc)
+            _record_outcome(provider, breaker, start, ok=False)
+            raise
+        slot.latency = _record_outcome(provider, breaker, start, ok=True)
+        return answer
 
-def generate_plan(profile: ProfileIn, snippets: list[dict]) -> dict:
+
+async def _apost_hedged(providers: List[Provider], payload: dict, timeout: float) -> str:
+    """Send to the fastest provider; if it is slower than its hedge delay (or fails), race the next one.
+
+    The first successful answer wins and the other request is cancelled.
+    """
+    primary = asyncio.ensure_future(_apost(providers[0], payload, timeout))
+    if not settings.LLM_HEDGE_ENABLED or len(providers) < 2:
+        return await primary
+    pending = {primary}
+    hedge = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=llm_router.hedge_delay(providers[0]))
+        if not done or primary.exception() is not None:
+            hedge = asyncio.ensure_future(_apost(providers[1], payload, timeout))
+            pending.add(hedge)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if hedge is not None:
+                        llm_router.record_hedge(won=task is hedge)
+                    return task.result()
+                # A limiter rejection must reach the caller as a 429, not hide behind a provider error.
+                if not isinstance(error, ConcurrencyLimitExceeded):
+                    error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def call_llm(
+    prompt: str,
+    *,
+    system_prompt: str,
+    temperature: float = 0.2,
+    response_format: dict | None = None,
+    timeout: float = 30.0,
+    use_cache: bool = True,
+    parse: Optional[Callable[[str], Any]] = None,
+) -> Any:
+    """Completion text, or ``parse(text)`` when given.
+
+    Only answers that ``parse`` accepts are cached, so a malformed completion
+    is never replayed; its exception propagates to the caller.
+    """
+    providers = _route()
+    payload = _chat_payload(prompt, system_prompt, temperature, response_format)
+    key = _cache_key(payload)
+    if use_cache:
+        cached = llm_response_cache.get(key)
+        if cached is not None:
+            try:
+                return parse(cached) if parse else cached
+            except Exception:
+                pass
+    # Blocking calls cannot cancel a losing request, so the sync path routes without hedging.
+    answer = _post(providers[0], payload, timeout)
+    result = parse(answer) if parse else answer
+    if answer:
+        llm_response_cache.set(key, answer)
+    return result
+
+
+async def acall_llm(
+    prompt: str,
+    *,
+    system_prompt: str,
+    temperature: float = 0.2,
+    response_format: dict | None = None,
+    timeout: float = 30.0,
+    use_cache: bool = True,
+    parse: Optional[Callable[[str], Any]] = None,
+) -> Any:
+    """Async ``call_llm``; hedges across providers when enabled."""
+    providers = _route()
+    payload = _chat_payload(prompt, system_prompt, temperature, response_format)
+    key = _cache_key(payload)
+    if use_cache:
+        cached = await asyncio.to_thread(llm_response_cache.get, key)
+        if cached is not None:
+            try:
+                return parse(cached) if parse else cached
+            except Exception:
+                pass
+    answer = await _apost_hedged(providers, payload, timeout)
+    result = parse(answer) if parse else answer
+    if answer:
+        await asyncio.to_thread(llm_response_cache.set, key, answer)
+    return result
+
+
+async def astream_llm(
+    prompt: str,
+    *,
+    system_prompt: str,
+    temperature: float = 0.2,
+    response_format: dict | None = None,
+    timeout: float = 30.0,
+) -> AsyncIterator[str]:
+    """Yield content deltas from a ``stream: true`` chat completion as they arrive."""
+    provider = _route()[0]
+    payload = {"model": provider.model, **_chat_payload(prompt, system_prompt, temperature, response_format)}
+    payload["stream"] = True
+    _check_circuit(provider)
+    async with get_concurrency_limiter(provider.name).aslot() as slot:
+        breaker = _acquire_circuit(provider)
+        connection_stats.record_request()
+        start = time.perf_counter()
+        opened = False
+        try:
+            async with get_async_http_client().stream(
+                "POST",
+                provider.url,
+                json=payload,
+                headers=provider.headers,
+                timeout=timeout,
+                extensions={"trace": connection_stats.atrace},
+            ) as response:
+                response.raise_for_status()
+                # Stream latency is judged on time to response headers, not on answer length.
+                opened = True
+                slot.latency = _record_outcome(provider, breaker, start, ok=True)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:") :].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        except Exception as exc:
+            if not opened:
+                slot.overloaded = _is_overload(exc)
+                _record_outcome(provider, breaker, start, ok=False)
+            raise
+
+
+PLAN_SYSTEM_PROMPT = "You are a structured visa planning assistant."
+
+
+def _parse_plan(raw_plan: str) -> PlanOut:
+    """Validate the model's plan once; ``sources`` and ``generated_at`` may be omitted."""
+    ai_plan = json.loads(raw_plan or "{}")
+    ai_plan.setdefault("sources", [])
+    ai_plan.setdefault("generated_at", datetime.utcnow().isoformat())
+    return PlanOut.model_validate(ai_plan)
+
+
+PLAN_SECTIONS = {
+    "summary": TypeAdapter(Summary),
+    "timeline": TypeAdapter(List[TimelineItem]),
+    "checklist": TypeAdapter(List[ChecklistItem]),
+    "documents": TypeAdapter(List[DocumentCategory]),
+    "risks": TypeAdapter(List[RiskItem]),
+}
+
+# Calls made with PLAN_GENERATION_MODE=sections; each asks for a narrowed schema.
+PLAN_SECTION_GROUPS = (("summary", "timeline"), ("checklist",), ("documents", "risks"))
+
+
+class IncompleteSections(ValueError):
+    """A narrowed completion with some sections missing or invalid; ``parsed`` holds the valid ones."""
+
+    def __init__(self, parsed: Dict[str, object]) -> None:
+        super().__init__("LLM answer is missing or has invalid plan sections")
+        self.parsed = parsed
+
+
+def _parse_sections(raw: str, sections: Sequence[str]) -> Dict[str, object]:
+    """Validated sections from one narrowed completion; raises ``IncompleteSections`` unless all are valid."""
+    data = json.loads(raw or "{}")
+    parsed: Dict[str, object] = {}
+    for key in sections:
+        try:
+            parsed[key] = PLAN_SECTIONS[key].validate_python(data[key])
+        except Exception:
+            continue
+    if len(parsed) < len(sections):
+        raise IncompleteSections(parsed)
+    return parsed
+
+
+def _merge_sections(profile: ProfileIn, outcomes: list) -> PlanOut:
+    """Combine section results; a section whose call failed or came back invalid uses the mock content."""
+    for outcome in outcomes:
+        if isinstance(outcome, ConcurrencyLimitExceeded):
+            raise outcome
+    sections: Dict[str, object] = {}
+    for outcome in outcomes:
+        if isinstance(outcome, IncompleteSections):
+            sections.update(outcome.parsed)
+        elif isinstance(outcome, dict):
+            sections.update(outcome)
+    if len(sections) < len(PLAN_SECTIONS):
+        mock_plan = _mock_template(profile).render([], "")
+        for key in PLAN_SECTIONS:
+            sections.setdefault(key, getattr(mock_plan, key))
+    # Every section is already validated, so the plan is constructed without revalidation.
+    return PlanOut.model_construct(**sections, sources=[], generated_at=datetime.utcnow().isoformat())
+
+
+def _section_call(sections: Sequence[str]) -> dict:
+    return {
+        "system_prompt": PLAN_SYSTEM_PROMPT,
+        "temperature": 0.2,
+        "response_format": {"type": "json_object"},
+        "parse": lambda raw: _parse_sections(raw, sections),
+    }
+
+
+def _generate_plan_sections(profile: ProfileIn, snippets: list[dict], use_cache: bool) -> PlanOut:
+    def generate(sections: Sequence[str]):
+        try:
+            return call_llm(build_prompt(profile, snippets, sections), use_cache=use_cache, **_section_call(sections))
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(max_workers=len(PLAN_SECTION_GROUPS)) as pool:
+        outcomes = list(pool.map(generate, PLAN_SECTION_GROUPS))
+    return _merge_sections(profile, outcomes)
+
+
+async def _agenerate_plan_sections(profile: ProfileIn, snippets: list[dict], use_cache: bool) -> PlanOut:
+    outcomes = await asyncio.gather(
+        *(
+            acall_llm(build_prompt(profile, snippets, sections), use_cache=use_cache, **_section_call(sections))
+            for sections in PLAN_SECTION_GROUPS
+        ),
+        return_exceptions=True,
+    )
+    return _merge_sections(profile, outcomes)
+
+
+def generate_plan(profile: ProfileIn, snippets: list[dict], use_cache: bool = True) -> PlanOut:
     if settings.MOCK_MODE or not settings.llm_api_key:
-        return build_mock_plan(profile, snippets).model_dump()
+        return build_mock_plan(profile, snippets)
+    if settings.PLAN_GENERATION_MODE == "sections":
+        return _generate_plan_sections(profile, snippets, use_cache)
 
     prompt = build_prompt(profile, snippets)
     try:
-        raw_plan = call_llm(
+        # Parsing inside the call keeps invalid plans out of the response cache.
+        return call_llm(
             prompt,
-            system_prompt="You are a structured visa planning assistant.",
+            system_prompt=PLAN_SYSTEM_PROMPT,
             temperature=0.2,
             response_format={"type": "json_object"},
+            use_cache=use_cache,
+            parse=_parse_plan,
         )
-        ai_plan = json.loads(raw_plan or "{}")
-        ai_plan.setdefault("generated_at", datetime.utcnow().isoformat())
-        return ai_plan
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception:
-        return build_mock_plan(profile, snippets).model_dump()
+        return build_mock_plan(profile, snippets)
+
+
+async def agenerate_llm_plan(profile: ProfileIn, snippets: list[dict], use_cache: bool = True) -> Optional[PlanOut]:
+    """The LLM's plan, or None when the caller should fall back to the mock plan.
+
+    That is mock mode, a provider error, an invalid answer or an open circuit;
+    callers that only need bytes can then use ``mock_plan_json`` directly.
+    """
+    if settings.MOCK_MODE or not settings.llm_api_key:
+        return None
+    if settings.PLAN_GENERATION_MODE == "sections":
+        return await _agenerate_plan_sections(profile, snippets, use_cache)
+
+    prompt = build_prompt(profile, snippets)
+    try:
+        # Parsing inside the call keeps invalid plans out of the response cache.
+        return await acall_llm(
+            prompt,
+            system_prompt=PLAN_SYSTEM_PROMPT,
+            temperature=0.2,
+            response_format={"type": "json_object"},
+            use_cache=use_cache,
+            parse=_parse_plan,
+        )
+    except ConcurrencyLimitExceeded:
+        raise
+    except Exception:
+        return None
+
+
+async def agenerate_plan(profile: ProfileIn, snippets: list[dict], use_cache: bool = True) -> PlanOut:
+    plan = await agenerate_llm_plan(profile, snippets, use_cache=use_cache)
+    return build_mock_plan(profile, snippets) if plan is None else plan
@@ -0,0 +1,180 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .circuit_breaker import get_circuit_breaker
+from .config import settings
+
+
+class Provider:
+    """An OpenAI-compatible chat completions endpoint and the model to request from it."""
+
+    def __init__(self, name: str, url: str, headers: dict, model: str) -> None:
+        self.name = name
+        self.url = url
+        self.headers = headers
+        self.model = model
+
+
+def configured_providers() -> List[Provider]:
+    """Every provider with credentials, in configuration-preference order (OpenRouter first)."""
+    providers: List[Provider] = []
+    if settings.OPENROUTER_API_KEY:
+        headers = {
+            "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        if settings.OPENROUTER_REFERRER:
+            headers["HTTP-Referer"] = settings.OPENROUTER_REFERRER
+        if settings.OPENROUTER_TITLE:
+            headers["X-Title"] = settings.OPENROUTER_TITLE
+        model = settings.OPENROUTER_MODEL or "openai/gpt-4o-mini"
+        providers.append(Provider("openrouter", settings.OPENROUTER_BASE_URL, headers, model))
+    if settings.OPENAI_API_KEY:
+        headers = {
+            "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        model = settings.LLM_PROVIDER or "gpt-4o-mini"
+        providers.append(Provider("openai", "https://api.openai.com/v1/chat/completions", headers, model))
+    return providers
+
+
+class ProviderStats:
+    """Recent call latencies and outcomes for one provider, bounded by count and by age.
+
+    Samples older than ``max_age`` seconds are dropped, so a provider that
+    stops being chosen loses its stale numbers, scores as unmeasured again and
+    is sent live traffic that re-measures it.
+    """
+
+    def __init__(self, window: int, max_age: float = 300.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_age = max_age
+        self.clock = clock
+        self.samples: Deque[Tuple[float, float, bool]] = deque(maxlen=window)
+
+    def _expire(self) -> None:
+        if self.max_age <= 0:
+            return
+        cutoff = self.clock() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.samples.append((self.clock(), latency, ok))
+
+    @property
+    def latencies(self) -> List[float]:
+        self._expire()
+        return [latency for _, latency, ok in self.samples if ok]
+
+    @property
+    def calls(self) -> int:
+        self._expire()
+        return len(self.samples)
+
+    @property
+    def error_rate(self) -> float:
+        self._expire()
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, _, ok in self.samples if not ok) / len(self.samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        latencies = self.latencies
+        if not latencies:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+    def score(self) -> float:
+        """Expected cost of a call: median latency inflated by the error rate.
+
+        Unmeasured providers score 0 so they get tried; providers whose recent
+        calls all failed score infinity and rank last.
+        """
+        if not self.calls:
+            return 0.0
+        median = self.percentile(0.5)
+        if median is None:
+            return math.inf
+        return median / max(1.0 - self.error_rate, 0.05)
+
+
+class LlmRouter:
+    """Orders providers by observed latency and errors, and decides when to hedge."""
+
+    def __init__(
+        self,
+        window: int = 50,
+        hedge_percentile: float = 0.9,
+        min_hedge_delay: float = 2.0,
+        max_age: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.max_age = max_age
+        self.clock = clock
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def _provider_stats(self, name: str) -> ProviderStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = ProviderStats(self.window, self.max_age, self.clock)
+        return stats
+
+    def ranked(self, providers: List[Provider]) -> List[Provider]:
+        """Providers whose circuit is not open, fastest first; with ``LLM_ROUTING=static``, config order."""
+        healthy = [provider for provider in providers if get_circuit_breaker(provider.name).available()]
+        # If every circuit is open, keep the order so the caller fails fast on the first one.
+        candidates = healthy or providers
+        if settings.LLM_ROUTING != "latency":
+            return candidates
+        with self._lock:
+            scores = {provider.name: self._provider_stats(provider.name).score() for provider in candidates}
+        return sorted(candidates, key=lambda provider: scores[provider.name])
+
+    def hedge_delay(self, provider: Provider) -> float:
+        """Wait this long for ``provider`` before sending a duplicate to the next one."""
+        with self._lock:
+            stats = self._provider_stats(provider.name)
+            threshold = stats.percentile(self.hedge_percentile) if len(stats.latencies) >= 10 else None
+        return max(threshold or 0.0, self.min_hedge_delay)
+
+    def record(self, provider: Provider, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._provider_stats(provider.name).record(latency, ok)
+
+    def record_hedge(self, won: bool) -> None:
+        with self._lock:
+            self.hedges += 1
+            if won:
+                self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            providers = {
+                name: {
+                    "calls": stats.calls,
+                    "error_rate": stats.error_rate,
+                    "p50_seconds": stats.percentile(0.5),
+                    "p95_seconds": stats.percentile(0.95),
+                }
+                for name, stats in self._stats.items()
+            }
+            return {"providers": providers, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+llm_router = LlmRouter(
+    window=settings.LLM_ROUTER_WINDOW,
+    hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+    min_hedge_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+    max_age=settings.LLM_ROUTER_MAX_AGE_SECONDS,
+)
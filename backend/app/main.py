@@ -1,14 +1,29 @@
+import json
 import logging
 import time
 import uuid
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
 
 from .config import settings
-from .chat_service import generate_chat_response
-from .plan_service import build_plan
+from .chat_service import agenerate_chat_response, astream_chat_response
+from .circuit_breaker import circuit_stats
+from .concurrency import ConcurrencyLimitExceeded, concurrency_stats
+from .kb import kb_index
+from .llm_router import llm_router
+from .llm_cache import llm_response_cache
+from .llm_client import (
+    aclose_http_client,
+    close_http_client,
+    connection_stats,
+    open_async_http_client,
+    open_http_client,
+)
+from .plan_service import abuild_plan_json, astream_plan, astream_plan_batch, plan_flights
 from .admin_api import router as admin_router
 from .middleware import RequestContextMiddleware
 from .schemas import (
@@ -16,11 +31,24 @@ from .schemas import (
     ChatOut,
     ErrorDetail,
     ErrorEnvelope,
+    PlanBatchIn,
     PlanOut,
     ProfileIn,
 )
 
-app = FastAPI(title="VisaVerse Mobility Copilot API")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    kb_index.refresh(force=True)
+    open_http_client()
+    open_async_http_client()
+    yield
+    llm_response_cache.close()
+    close_http_client()
+    await aclose_http_client()
+
+
+app = FastAPI(title="VisaVerse Mobility Copilot API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,12 +69,37 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/api/metrics")
+def metrics() -> dict:
+    return {
+        "retrieval_cache": kb_index.retrieval_cache.stats(),
+        "llm_http": connection_stats.stats(),
+        "llm_cache": llm_response_cache.stats(),
+        "plan_single_flight": plan_flights.stats(),
+        "llm_circuits": circuit_stats(),
+        "llm_routing": llm_router.stats(),
+        "llm_concurrency": concurrency_stats(),
+    }
+
+
+def _use_llm_cache(request: Request) -> bool:
+    """``Cache-Control: no-cache`` asks for a fresh completion instead of a cached one."""
+    return "no-cache" not in request.headers.get("cache-control", "").lower()
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.post("/api/plan", response_model=PlanOut)
-def create_plan(profile: ProfileIn, request: Request) -> PlanOut:
+async def create_plan(profile: ProfileIn, request: Request) -> Response:
     request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
     start = time.perf_counter()
     try:
-        plan = build_plan(profile)
+        # Already a validated PlanOut serialisation, so it bypasses response_model.
+        body, sources_count = await abuild_plan_json(profile, use_cache=_use_llm_cache(request))
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception as exc:
         logger.exception(
             "plan_generation_failed",
@@ -68,11 +121,122 @@ def create_plan(profile: ProfileIn, request: Request) -> PlanOut:
           "request_id": request_id,
           "mode": mode,
           "latency_ms": latency_ms,
-          "sources_count": len(plan.sources),
+          "sources_count": sources_count,
           "endpoint": "/api/plan",
         },
     )
-    return plan
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/api/plan/stream")
+async def create_plan_stream(profile: ProfileIn, request: Request) -> StreamingResponse:
+    request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
+    mode = (
+        "mock"
+        if settings.MOCK_MODE or not settings.llm_api_key
+        else settings.llm_mode
+    )
+
+    async def events():
+        start = time.perf_counter()
+        first_section_ms = None
+        try:
+            async for event, data in astream_plan(profile):
+                if first_section_ms is None and event not in ("sources", "rule_risks"):
+                    first_section_ms = int((time.perf_counter() - start) * 1000)
+                yield _sse_event(event, data)
+        except ConcurrencyLimitExceeded as exc:
+            yield _sse_event("error", _rate_limited_error(exc).model_dump())
+            return
+        except Exception as exc:
+            logger.exception(
+                "plan_stream_failed",
+                extra={"request_id": request_id, "endpoint": "/api/plan/stream"},
+            )
+            error = ErrorDetail(code="PLAN_ERROR", message="Failed to generate plan", details=str(exc))
+            yield _sse_event("error", error.model_dump())
+            return
+        logger.info(
+            "plan_stream_completed",
+            extra={
+              "request_id": request_id,
+              "mode": mode,
+              "first_section_ms": first_section_ms,
+              "latency_ms": int((time.perf_counter() - start) * 1000),
+              "endpoint": "/api/plan/stream",
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/plans/batch", responses={400: {"model": ErrorEnvelope}})
+async def create_plan_batch(payload: PlanBatchIn, request: Request) -> StreamingResponse:
+    """One NDJSON line per profile, ``{"index", "plan"}`` or ``{"index", "error"}``, in completion order."""
+    request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
+    if len(payload.profiles) > settings.PLAN_BATCH_MAX_PROFILES:
+        envelope = ErrorEnvelope(
+            error=ErrorDetail(
+                code="BATCH_TOO_LARGE",
+                message=f"A batch may contain at most {settings.PLAN_BATCH_MAX_PROFILES} profiles",
+                details={"received": len(payload.profiles)},
+            )
+        )
+        raise HTTPException(status_code=400, detail=envelope.model_dump())
+
+    valid_indexes = []
+    profiles = []
+    invalid = []
+    for index, raw in enumerate(payload.profiles):
+        try:
+            profiles.append(ProfileIn.model_validate(raw))
+            valid_indexes.append(index)
+        except ValidationError as exc:
+            error = ErrorDetail(
+                code="INVALID_PROFILE",
+                message="Profile failed validation",
+                details=json.loads(exc.json(include_url=False)),
+            )
+            invalid.append({"index": index, "error": error.model_dump()})
+    use_cache = _use_llm_cache(request)
+
+    async def lines():
+        start = time.perf_counter()
+        failed = len(invalid)
+        for item in invalid:
+            yield json.dumps(item) + "\n"
+        if profiles:
+            async for position, outcome in astream_plan_batch(profiles, use_cache=use_cache):
+                index = valid_indexes[position]
+                if isinstance(outcome, PlanOut):
+                    yield json.dumps({"index": index, "plan": outcome.model_dump(mode="json")}, ensure_ascii=False) + "\n"
+                    continue
+                failed += 1
+                if isinstance(outcome, ConcurrencyLimitExceeded):
+                    error = _rate_limited_error(outcome)
+                else:
+                    logger.error(
+                        "plan_batch_item_failed",
+                        extra={"request_id": request_id, "index": index, "error": str(outcome)},
+                    )
+                    error = ErrorDetail(code="PLAN_ERROR", message="Failed to generate plan", details=str(outcome))
+                yield json.dumps({"index": index, "error": error.model_dump()}) + "\n"
+        logger.info(
+            "plan_batch_completed",
+            extra={
+              "request_id": request_id,
+              "profiles": len(payload.profiles),
+              "failed": failed,
+              "latency_ms": int((time.perf_counter() - start) * 1000),
+              "endpoint": "/api/plans/batch",
+            },
+        )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
 
 
 @app.post(
@@ -80,7 +244,7 @@ def create_plan(profile: ProfileIn, request: Request) -> PlanOut:
     response_model=ChatOut,
     responses={400: {"model": ErrorEnvelope}, 500: {"model": ErrorEnvelope}},
 )
-def chat(payload: ChatIn, request: Request) -> ChatOut:
+async def chat(payload: ChatIn, request: Request) -> ChatOut:
     request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
     start = time.perf_counter()
     mode = (
@@ -89,7 +253,7 @@ def chat(payload: ChatIn, request: Request) -> ChatOut:
         else settings.llm_mode
     )
     try:
-        response = generate_chat_response(payload)
+        response = await agenerate_chat_response(payload, use_cache=_use_llm_cache(request))
         latency_ms = int((time.perf_counter() - start) * 1000)
         logger.info(
             "chat_completed",
@@ -102,6 +266,8 @@ def chat(payload: ChatIn, request: Request) -> ChatOut:
             },
         )
         return response
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception as exc:
         logger.exception(
             "chat_failed",
@@ -113,6 +279,75 @@ def chat(payload: ChatIn, request: Request) -> ChatOut:
         raise HTTPException(status_code=500, detail=envelope.model_dump())
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(payload: ChatIn, request: Request) -> StreamingResponse:
+    request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
+    mode = (
+        "mock"
+        if settings.MOCK_MODE or not settings.llm_api_key
+        else settings.llm_mode
+    )
+
+    async def events():
+        start = time.perf_counter()
+        first_token_ms = None
+        try:
+            async for event, data in astream_chat_response(payload):
+                if event == "delta" and first_token_ms is None:
+                    first_token_ms = int((time.perf_counter() - start) * 1000)
+                yield _sse_event(event, data)
+        except ConcurrencyLimitExceeded as exc:
+            yield _sse_event("error", _rate_limited_error(exc).model_dump())
+            return
+        except Exception as exc:
+            logger.exception(
+                "chat_stream_failed",
+                extra={"request_id": request_id, "endpoint": "/api/chat/stream"},
+            )
+            error = ErrorDetail(code="CHAT_ERROR", message="Failed to process chat message", details=str(exc))
+            yield _sse_event("error", error.model_dump())
+            return
+        logger.info(
+            "chat_stream_completed",
+            extra={
+              "request_id": request_id,
+              "mode": mode,
+              "ttft_ms": first_token_ms,
+              "latency_ms": int((time.perf_counter() - start) * 1000),
+              "endpoint": "/api/chat/stream",
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _rate_limited_error(exc: ConcurrencyLimitExceeded) -> ErrorDetail:
+    return ErrorDetail(
+        code="RATE_LIMITED",
+        message="Too many requests are waiting for the language model. Please retry shortly.",
+        details={"reason": str(exc), "retry_after": exc.retry_after},
+    )
+
+
+@app.exception_handler(ConcurrencyLimitExceeded)
+async def concurrency_limit_handler(request: Request, exc: ConcurrencyLimitExceeded):
+    request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
+    logger.warning(
+        "llm_admission_rejected",
+        extra={"request_id": request_id, "path": request.url.path, "retry_after": exc.retry_after},
+    )
+    envelope = ErrorEnvelope(error=_rate_limited_error(exc))
+    return JSONResponse(
+        status_code=429,
+        content=envelope.model_dump(),
+        headers={"Retry-After": str(exc.retry_after), "x-request-id": request_id},
+    )
+
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
@@ -1,26 +1,224 @@
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from .concurrency import ConcurrencyLimitExceeded
 from .config import settings
 from .kb import retrieve_snippets
-from .llm_client import generate_plan
+from .json_stream import TopLevelJsonParser
+from .llm_client import (
+    PLAN_SECTIONS,
+    PLAN_SYSTEM_PROMPT,
+    agenerate_llm_plan,
+    agenerate_plan,
+    astream_llm,
+    build_mock_plan,
+    generate_plan,
+    mock_plan_json,
+    mock_sources,
+)
+from .prompts import build_prompt
 from .rules import evaluate_rules
+from .single_flight import SingleFlight
 from .schemas import PlanOut, ProfileIn, RiskItem, SourceRef
 
+plan_flights = SingleFlight()
+
 
-def build_plan(profile: ProfileIn) -> PlanOut:
-    snippets = retrieve_snippets(profile, k=settings.MAX_SNIPPETS)
-    plan_dict = generate_plan(profile, snippets)
+def _retrieve(profile: ProfileIn) -> List[dict]:
+    return retrieve_snippets(profile, k=settings.MAX_SNIPPETS, mode=settings.PLAN_RETRIEVAL_MODE)
 
-    existing_risks = plan_dict.get("risks", []) or []
-    rule_risks = [risk.model_dump() for risk in evaluate_rules(profile)]
-    combined_risks = existing_risks + rule_risks
 
-    sources = plan_dict.get("sources", []) or []
+def _assemble_plan(
+    profile: ProfileIn, snippets: List[dict], plan: PlanOut, rule_risks: Optional[List[RiskItem]] = None
+) -> PlanOut:
+    """Add rule risks and KB sources to an already validated plan without revalidating it."""
+    if rule_risks is None:
+        rule_risks = evaluate_rules(profile)
+    cited = {source.ref for source in plan.sources}
     snippet_sources = [
-        SourceRef(title=s.get("title", ""), ref=s.get("ref", "")) for s in snippets
+        SourceRef.model_construct(title=s.get("title", ""), ref=s.get("ref", ""))
+        for s in snippets
+        if s.get("ref", "") not in cited
     ]
-    plan_dict["sources"] = sources + [s.model_dump() for s in snippet_sources]
-    plan_dict["risks"] = combined_risks
-    plan_dict.setdefault("generated_at", datetime.utcnow().isoformat())
+    return plan.model_copy(update={"risks": plan.risks + rule_risks, "sources": plan.sources + snippet_sources})
+
+
+def _flight_key(profile: ProfileIn, use_cache: bool) -> Tuple[str, bool]:
+    # Country fields are already canonical ISO-2 codes after validation.
+    return profile.model_dump_json(), use_cache
+
+
+def _build_plan(profile: ProfileIn, use_cache: bool) -> PlanOut:
+    snippets = _retrieve(profile)
+    plan = generate_plan(profile, snippets, use_cache=use_cache)
+    return _assemble_plan(profile, snippets, plan)
+
+
+async def _abuild_plan(profile: ProfileIn, use_cache: bool) -> PlanOut:
+    # A KB refresh may stat files or query the DB, so keep it off the event loop.
+    snippets = await run_in_threadpool(_retrieve, profile)
+    plan = await agenerate_plan(profile, snippets, use_cache=use_cache)
+    return _assemble_plan(profile, snippets, plan)
+
+
+def build_plan(profile: ProfileIn, use_cache: bool = True) -> PlanOut:
+    """Identical profiles requested concurrently share one generation."""
+    return plan_flights.do(_flight_key(profile, use_cache), lambda: _build_plan(profile, use_cache))
+
+
+async def abuild_plan(profile: ProfileIn, use_cache: bool = True) -> PlanOut:
+    return await plan_flights.ado(_flight_key(profile, use_cache), lambda: _abuild_plan(profile, use_cache))
+
+
+def _mock_plan_json(profile: ProfileIn, snippets: Optional[List[dict]] = None) -> Tuple[bytes, int]:
+    sources = mock_sources(_retrieve(profile) if snippets is None else snippets)
+    return mock_plan_json(profile, sources, evaluate_rules(profile)), len(sources)
+
+
+async def _abuild_plan_json(profile: ProfileIn, use_cache: bool) -> Tuple[bytes, int]:
+    snippets = await run_in_threadpool(_retrieve, profile)
+    plan = await agenerate_llm_plan(profile, snippets, use_cache=use_cache)
+    if plan is None:
+        # Degraded mode (provider error, open circuit) must stay cheap under load: no PlanOut is built.
+        return _mock_plan_json(profile, snippets)
+    plan = _assemble_plan(profile, snippets, plan)
+    return plan.model_dump_json().encode(), len(plan.sources)
+
+
+async def abuild_plan_json(profile: ProfileIn, use_cache: bool = True) -> Tuple[bytes, int]:
+    """Serialised ``PlanOut`` and its source count; mock output skips model construction entirely."""
+    if settings.MOCK_MODE or not settings.llm_api_key:
+        return await run_in_threadpool(_mock_plan_json, profile)
+    # Keyed apart from ``abuild_plan`` flights, which share the map but return a PlanOut.
+    key = ("json",) + _flight_key(profile, use_cache)
+    return await plan_flights.ado(key, lambda: _abuild_plan_json(profile, use_cache))
+
+
+async def astream_plan(profile: ProfileIn) -> AsyncIterator[Tuple[str, dict]]:
+    """Yield ``(event, data)`` pairs for a plan as it is generated.
+
+    KB ``sources`` and rule-based ``rule_risks`` come first since they need no
+    LLM call. Each section of ``PLAN_SECTIONS`` is then validated and emitted as
+    soon as its JSON value is complete; sections the model omits, gets wrong, or
+    never reaches because the call failed are filled from the mock plan.
+    The stream ends with ``done`` carrying ``generated_at``.
+    """
+    snippets = await run_in_threadpool(_retrieve, profile)
+    sources = [SourceRef(title=s.get("title", ""), ref=s.get("ref", "")).model_dump() for s in snippets]
+    yield "sources", {"sources": sources}
+    yield "rule_risks", {"risks": [risk.model_dump() for risk in evaluate_rules(profile)]}
+
+    emitted = set()
+    generated_at = None
+    if not (settings.MOCK_MODE or not settings.llm_api_key):
+        parser = TopLevelJsonParser()
+        try:
+            async for delta in astream_llm(
+                build_prompt(profile, snippets),
+                system_prompt=PLAN_SYSTEM_PROMPT,
+                temperature=0.2,
+                response_format={"type": "json_object"},
+            ):
+                for key, value in parser.feed(delta):
+                    if key == "generated_at" and isinstance(value, str):
+                        generated_at = value
+                    adapter = PLAN_SECTIONS.get(key)
+                    if adapter is None or key in emitted:
+                        continue
+                    try:
+                        section = adapter.validate_python(value)
+                    except ValidationError:
+                        continue
+                    emitted.add(key)
+                    yield key, {key: adapter.dump_python(section, mode="json")}
+        except ConcurrencyLimitExceeded:
+            raise
+        except Exception:
+            pass
+
+    if len(emitted) < len(PLAN_SECTIONS):
+        mock_plan = build_mock_plan(profile, snippets).model_dump(mode="json")
+        for key in PLAN_SECTIONS:
+            if key not in emitted:
+                yield key, {key: mock_plan[key]}
+    yield "done", {"generated_at": generated_at or datetime.utcnow().isoformat()}
+
+
+def _batch_group_key(profile: ProfileIn) -> tuple:
+    """Profiles with the same key share one retrieval and one generated plan.
+
+    ``PLAN_BATCH_GROUPING=near`` keeps what the plan prompt depends on but
+    coarsens dates to the departure week and whether the passport clears the
+    six-month rule; notes only count when retrieval is semantic. Rule risks are
+    still evaluated on each exact profile. Any other value groups exact copies only.
+    """
+    if settings.PLAN_BATCH_GROUPING != "near":
+        return (profile.model_dump_json(),)
+    departure = profile.planned_departure_date
+    return (
+        profile.origin_country,
+        profile.destination_country,
+        profile.purpose,
+        profile.language,
+        profile.duration_months,
+        profile.has_sponsor,
+        profile.proof_of_funds_level,
+        departure.isocalendar()[:2],
+        profile.passport_expiry_date - departure >= timedelta(days=180),
+        profile.notes if settings.PLAN_RETRIEVAL_MODE == "semantic" else None,
+    )
+
+
+def _prepare_batch(
+    profiles: List[ProfileIn],
+) -> Tuple[Dict[tuple, List[int]], Dict[tuple, List[dict]], List[List[RiskItem]]]:
+    groups: Dict[tuple, List[int]] = {}
+    for index, profile in enumerate(profiles):
+        groups.setdefault(_batch_group_key(profile), []).append(index)
+    snippets = {key: _retrieve(profiles[indexes[0]]) for key, indexes in groups.items()}
+    rule_risks = [evaluate_rules(profile) for profile in profiles]
+    return groups, snippets, rule_risks
+
+
+async def astream_plan_batch(
+    profiles: List[ProfileIn], use_cache: bool = True
+) -> AsyncIterator[Tuple[int, Union[PlanOut, Exception]]]:
+    """Yield ``(index, plan or exception)`` for every profile, in completion order.
+
+    Grouping, retrieval and rule checks run in one threadpool pass; then one
+    plan is generated per group, at most ``PLAN_BATCH_CONCURRENCY`` at a time,
+    and every member of a group is answered as soon as its plan is ready.
+    """
+    groups, snippets, rule_risks = await run_in_threadpool(_prepare_batch, profiles)
+    semaphore = asyncio.Semaphore(max(1, settings.PLAN_BATCH_CONCURRENCY))
+
+    async def generate(key: tuple, indexes: List[int]) -> Tuple[tuple, List[int], Union[PlanOut, Exception]]:
+        async with semaphore:
+            try:
+                plan = await agenerate_plan(profiles[indexes[0]], snippets[key], use_cache=use_cache)
+            except Exception as exc:
+                return key, indexes, exc
+        return key, indexes, plan
 
-    return PlanOut.model_validate(plan_dict)
+    tasks = [asyncio.create_task(generate(key, indexes)) for key, indexes in groups.items()]
+    try:
+        for next_group in asyncio.as_completed(tasks):
+            key, indexes, outcome = await next_group
+            for index in indexes:
+                if isinstance(outcome, Exception):
+                    yield index, outcome
+                    continue
+                try:
+                    # Assembly copies the shared group plan, so members never see each other's risks.
+                    plan = _assemble_plan(profiles[index], snippets[key], outcome, rule_risks[index])
+                except Exception as exc:
+                    yield index, exc
+                    continue
+                yield index, plan
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,49 @@
+import re
+from typing import List, Sequence
+
+PIECE_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+MIN_TRUNCATED_TOKENS = 24
+ELLIPSIS = "…"
+
+
+def estimate_tokens(text: str) -> int:
+    """Local BPE-style estimate: one token per ~4 characters of a word, one per punctuation mark."""
+    return sum((len(piece) + 3) // 4 for piece in PIECE_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    used = 0
+    end = 0
+    for match in PIECE_PATTERN.finditer(text):
+        cost = (len(match.group()) + 3) // 4
+        if used + cost > max_tokens:
+            return text[:end].rstrip() + ELLIPSIS
+        used += cost
+        end = match.end()
+    return text
+
+
+def fit_items(items: Sequence[str], budget: int) -> List[str]:
+    """Keep ``items`` in priority order while they fit in ``budget`` tokens.
+
+    The first item that does not fit is truncated when enough budget is left
+    for it to stay useful; everything after it is dropped. Each item is charged
+    one extra token for the separator it is joined with.
+    """
+    kept: List[str] = []
+    remaining = budget
+    for item in items:
+        cost = estimate_tokens(item) + 1
+        if cost <= remaining:
+            kept.append(item)
+            remaining -= cost
+            continue
+        if remaining > MIN_TRUNCATED_TOKENS:
+            kept.append(truncate_to_tokens(item, remaining - 2))
+        break
+    return kept
+
+
+def fit_recent(items: Sequence[str], budget: int) -> List[str]:
+    """Like ``fit_items`` but gives priority to the most recent (last) items; order is preserved."""
+    return list(reversed(fit_items(list(reversed(items)), budget)))
@@ -1,24 +1,52 @@
+import logging
 from textwrap import dedent
+from typing import Optional, Sequence
 
+from .config import settings
+from .countries import country_label
+from .prompt_budget import estimate_tokens, fit_items
 from .schemas import ProfileIn
 
+logger = logging.getLogger("visaverse")
 
-def build_prompt(profile: ProfileIn, snippets: list[dict]) -> str:
-    sources_text = "\n\n".join(
-        [f"Source: {s.get('title')} ({s.get('ref')})\n{s.get('content', '')}" for s in snippets]
+
+def build_prompt(profile: ProfileIn, snippets: list[dict], sections: Optional[Sequence[str]] = None) -> str:
+    """Plan prompt with as many ranked snippets as fit in ``PLAN_PROMPT_TOKEN_BUDGET``.
+
+    ``sections`` narrows the requested JSON to those top-level PlanOut keys.
+    """
+    sources = [f"Source: {s.get('title')} ({s.get('ref')})\n{s.get('content', '')}" for s in snippets]
+    budget = settings.PLAN_PROMPT_TOKEN_BUDGET
+    if budget > 0:
+        sources = fit_items(sources, budget - estimate_tokens(_render_plan_prompt(profile, "", sections)))
+    prompt = _render_plan_prompt(profile, "\n\n".join(sources), sections)
+    logger.info(
+        "prompt_assembled",
+        extra={
+            "feature": "plan",
+            "sections": ",".join(sections or PLAN_KEYS),
+            "prompt_tokens_estimate": estimate_tokens(prompt),
+            "token_budget": budget,
+            "snippets_used": len(sources),
+            "snippets_total": len(snippets),
+        },
     )
-    schema_example = """
-{
-  "summary": {
+    return prompt
+
+
+PLAN_KEYS = ("summary", "timeline", "checklist", "documents", "risks", "sources", "generated_at")
+
+SCHEMA_EXAMPLES = {
+    "summary": """  "summary": {
     "title": "Short sentence",
     "key_advice": ["tip 1", "tip 2"],
     "assumptions": ["assumption 1"],
     "confidence": 0.82
-  },
-  "timeline": [
+  }""",
+    "timeline": """  "timeline": [
     {"when": "2025-01-05", "actions": ["Action A", "Action B"], "priority": "HIGH"}
-  ],
-  "checklist": [
+  ]""",
+    "checklist": """  "checklist": [
     {
       "id": "book_appointment",
       "title": "Book visa appointment",
@@ -27,16 +55,16 @@ def build_prompt(profile: ProfileIn, snippets: list[dict]) -> str:
       "estimated_time": "3 days",
       "dependencies": []
     }
-  ],
-  "documents": [
+  ]""",
+    "documents": """  "documents": [
     {
       "category": "Identity",
       "items": [
         {"name": "Passport", "why": "Proof of identity", "priority": "HIGH", "common_mistakes": ["Expired"] }
       ]
     }
-  ],
-  "risks": [
+  ]""",
+    "risks": """  "risks": [
     {
       "id": "insufficient_funds",
       "risk": "Funds may be insufficient",
@@ -44,28 +72,37 @@ def build_prompt(profile: ProfileIn, snippets: list[dict]) -> str:
       "mitigation": ["Add sponsor letter"],
       "severity": "HIGH"
     }
-  ],
-  "sources": [
+  ]""",
+    "sources": """  "sources": [
     {"title": "Cm To Fr Student", "ref": "country_pairs/cm_to_fr_student.md"}
-  ],
-  "generated_at": "2025-02-01T10:00:00Z"
+  ]""",
+    "generated_at": '  "generated_at": "2025-02-01T10:00:00Z"',
 }
-""".strip()
+
+SECTION_RULES = {
+    "timeline": "Each timeline item must be an object with fields when, actions[], priority.",
+    "checklist": "Each checklist item must include id, title, steps[], priority, estimated_time, dependencies[].",
+    "documents": "Each document category must include category and items[] where each item has name, why, priority, common_mistakes[].",
+    "risks": "Risks must include id, risk, why_it_matters, mitigation[], severity.",
+}
+
+
+def _render_plan_prompt(profile: ProfileIn, sources_text: str, sections: Optional[Sequence[str]] = None) -> str:
+    keys = list(sections or PLAN_KEYS)
+    schema_example = "{\n" + ",\n".join(SCHEMA_EXAMPLES[key] for key in keys) + "\n}"
+    target = "the PlanOut schema" if sections is None else "these sections of the PlanOut schema"
+    rules = "".join(f"\n        {SECTION_RULES[key]}" for key in keys if key in SECTION_RULES)
     return dedent(
         f"""
-        You are a visa mobility planner. Produce ONLY JSON that matches the PlanOut schema.
+        You are a visa mobility planner. Produce ONLY JSON that matches {target}.
         Respond in the language specified by the profile language (FR = French, EN = English).
-        Do not include any commentary. The JSON MUST include these keys exactly: summary, timeline, checklist, documents, risks, sources, generated_at.
-        Each timeline item must be an object with fields when, actions[], priority.
-        Each checklist item must include id, title, steps[], priority, estimated_time, dependencies[].
-        Each document category must include category and items[] where each item has name, why, priority, common_mistakes[].
-        Risks must include id, risk, why_it_matters, mitigation[], severity.
+        Do not include any commentary. The JSON MUST include these keys exactly: {", ".join(keys)}.{rules}
         Follow this example shape strictly:
         {schema_example}
 
         Profile:
-        origin_country: {profile.origin_country}
-        destination_country: {profile.destination_country}
+        origin_country: {country_label(profile.origin_country)}
+        destination_country: {country_label(profile.destination_country)}
         purpose: {profile.purpose}
         departure: {profile.planned_departure_date}
         duration_months: {profile.duration_months}
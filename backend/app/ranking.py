@@ -0,0 +1,149 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    """
+    a an and are as at be can do does for from have how i if in is it my of on or should the
+    to what when where which who will with you your
+    au aux avec ce ces dans de des du elle en est et il je la le les mon ma mes ne ou par pas
+    pour que quel quelle qui sur un une vous votre
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def query_terms(text: str) -> List[str]:
+    """Tokens of a free-text question, minus EN/FR stopwords and single letters."""
+    return [token for token in tokenize(text) if len(token) > 1 and token not in STOPWORDS]
+
+
+def term_counts(text: str) -> Counter:
+    return Counter(tokenize(text))
+
+
+def iter_ranked(scores: Dict[Hashable, float]) -> Iterator[Tuple[Hashable, float]]:
+    """Yield items best-first, paying only for the ones the caller consumes."""
+    heap = [(-score, position, item) for position, (item, score) in enumerate(scores.items())]
+    heapq.heapify(heap)
+    while heap:
+        negative_score, _, item = heapq.heappop(heap)
+        yield item, -negative_score
+
+
+Postings = Mapping[str, Mapping[Hashable, int]]
+
+
+class MergedPostings(Mapping):
+    """Postings of a base index with documents dropped and added, resolved per term on first use.
+
+    The base is never copied, so merging into a lazily decoded index keeps it lazy.
+    """
+
+    def __init__(self, base: Postings, added: Dict[str, Dict[Hashable, int]], dropped: Iterable[Hashable]) -> None:
+        self._base = base
+        self._added = added
+        self._dropped = frozenset(dropped)
+        self._resolved: Dict[str, Dict[Hashable, int]] = {}
+
+    def __getitem__(self, term: str) -> Dict[Hashable, int]:
+        docs = self._resolved.get(term)
+        if docs is None:
+            docs = {doc: count for doc, count in self._base.get(term, {}).items() if doc not in self._dropped}
+            docs.update(self._added.get(term, {}))
+            if not docs:
+                raise KeyError(term)
+            self._resolved[term] = docs
+        return docs
+
+    def __iter__(self) -> Iterator[str]:
+        terms = dict.fromkeys(self._base)
+        terms.update(dict.fromkeys(self._added))
+        return (term for term in terms if term in self)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class Bm25Index:
+    """Okapi BM25 over precomputed postings and lengths.
+
+    Documents are any hashable objects; the caller supplies their term counts
+    once at build time so queries only walk the postings of the query terms.
+    ``postings`` may be any mapping, so it can be resolved lazily per term.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[Hashable, Counter]], k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Postings = {}
+        self.lengths: Dict[Hashable, int] = {}
+        self._add(documents)
+        self._compute_statistics()
+
+    @classmethod
+    def from_postings(
+        cls, postings: Postings, lengths: Dict[Hashable, int], k1: float = 1.2, b: float = 0.75
+    ) -> "Bm25Index":
+        index = cls((), k1=k1, b=b)
+        index.postings = postings
+        index.lengths = lengths
+        index._compute_statistics()
+        return index
+
+    def merged(self, added: Iterable[Tuple[Hashable, Counter]], removed: Iterable[Hashable] = ()) -> "Bm25Index":
+        """Copy of this index with documents added and removed; ``self`` is left untouched."""
+        dropped = set(removed)
+        index = Bm25Index((), k1=self.k1, b=self.b)
+        index.lengths = {doc: length for doc, length in self.lengths.items() if doc not in dropped}
+        index._add(added)
+        index.postings = MergedPostings(self.postings, index.postings, dropped)
+        index._compute_statistics()
+        return index
+
+    def _add(self, documents: Iterable[Tuple[Hashable, Counter]]) -> None:
+        for document, counts in documents:
+            self.lengths[document] = sum(counts.values())
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[document] = count
+
+    def _compute_statistics(self) -> None:
+        self.document_count = len(self.lengths)
+        total_length = sum(self.lengths.values())
+        self.average_length = total_length / self.document_count if self.document_count else 0.0
+
+    def idf(self, document_frequency: int) -> float:
+        return math.log(1 + (self.document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def scores(self, query_terms: Iterable[str], candidates: Optional[Iterable[Hashable]] = None) -> Dict[Hashable, float]:
+        allowed = None if candidates is None else set(candidates)
+        if allowed is not None and not allowed:
+            return {}
+        scores: Dict[Hashable, float] = {}
+        for term in set(query_terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(len(postings))
+            if allowed is not None and len(allowed) < len(postings):
+                matches = ((doc, postings[doc]) for doc in allowed if doc in postings)
+            else:
+                matches = postings.items()
+            for document, frequency in matches:
+                if allowed is not None and document not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[document] / self.average_length)
+                scores[document] = scores.get(document, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def top_k(
+        self, query_terms: Iterable[str], k: int, candidates: Optional[Iterable[Hashable]] = None
+    ) -> List[Tuple[Hashable, float]]:
+        scores = self.scores(query_terms, candidates)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -1,9 +1,11 @@
 from datetime import date
 from enum import Enum
-from typing import Any, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
+from .countries import canonical_country
+
 
 class PurposeEnum(str, Enum):
     STUDY = "STUDY"
@@ -87,6 +89,11 @@ class ProfileIn(BaseModel):
     language: LanguageEnum
     notes: Optional[str] = None
 
+    @field_validator("origin_country", "destination_country")
+    @classmethod
+    def normalize_country(cls, value: str) -> str:
+        return canonical_country(value)
+
     @field_validator("duration_months")
     @classmethod
     def validate_duration(cls, value: int) -> int:
@@ -105,6 +112,11 @@ class PlanOut(BaseModel):
     generated_at: str
 
 
+class PlanBatchIn(BaseModel):
+    # Items are validated one by one so a bad profile fails alone, not the whole batch.
+    profiles: List[Dict[str, Any]] = Field(min_length=1)
+
+
 class ChatMessage(BaseModel):
     role: Literal["user", "assistant", "system"] = "user"
     content: str
@@ -2,7 +2,9 @@
 
 from pathlib import Path
 
+from .config import settings
 from .database import Base, engine, session_scope
+from .kb import bump_generation
 from .models import KbDocument, KbVersion
 
 
@@ -20,7 +22,9 @@ def seed_from_markdown(kb_dir: str = "../kb"):
                 continue
             doc = KbDocument(title=title, status="published")
             version = KbVersion(document=doc, content=content, status="published", version=1)
+            doc.current_version = version
             session.add_all([doc, version])
+    bump_generation(Path(settings.KB_GENERATION_FILE))
 
 
 if __name__ == "__main__":
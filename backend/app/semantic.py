@@ -0,0 +1,116 @@
+import math
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+CHAR_NGRAM_SIZES = (3, 4, 5)
+MIN_SIMILARITY = 0.08
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents so "Études" and "etudes" hash the same."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def hashed_features(text: str, dimensions: int) -> Counter:
+    """Word and character n-gram counts hashed into ``dimensions`` buckets.
+
+    Character n-grams let "biometric" meet "biométrie" or "biometrics" without
+    a language-specific stemmer, which keeps EN and FR content on one model.
+    """
+    features: Counter = Counter()
+    for word in WORD_PATTERN.findall(fold(text)):
+        features[zlib.crc32(f"w:{word}".encode("utf-8")) % dimensions] += 1
+        padded = f"<{word}>"
+        for size in CHAR_NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                gram = padded[start : start + size]
+                features[zlib.crc32(gram.encode("utf-8")) % dimensions] += 1
+    return features
+
+
+class SemanticIndex:
+    """Sparse (CSR), L2-normalised TF-IDF rows over hashed features.
+
+    Rows are kept as flat ``indptr``/``indices``/``data`` arrays, so memory
+    grows with the features a chunk actually has rather than ``dimensions``.
+    A query is scored against the requested rows only, in one vectorized
+    gather and sum. Passing the ``previous`` index reuses the feature counts of
+    items it already hashed, so a rebuild only tokenizes new items.
+    """
+
+    def __init__(
+        self,
+        items: Sequence[Hashable],
+        text: Callable[[Hashable], str],
+        dimensions: int = 4096,
+        previous: Optional["SemanticIndex"] = None,
+    ) -> None:
+        self.dimensions = dimensions
+        self.items: List[Hashable] = list(items)
+        self.rows: Dict[Hashable, int] = {item: row for row, item in enumerate(self.items)}
+        reusable = previous._features if previous is not None and previous.dimensions == dimensions else {}
+        self._features: Dict[Hashable, Tuple[np.ndarray, np.ndarray]] = {}
+        for item in self.items:
+            features = reusable.get(item)
+            if features is None:
+                counts = hashed_features(text(item), dimensions)
+                features = (
+                    np.fromiter(counts.keys(), dtype=np.int32, count=len(counts)),
+                    np.fromiter((1.0 + math.log(count) for count in counts.values()), dtype=np.float32, count=len(counts)),
+                )
+            self._features[item] = features
+
+        sizes = np.fromiter((len(self._features[item][0]) for item in self.items), dtype=np.int64, count=len(self.items))
+        self.indptr = np.zeros(len(self.items) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.indptr[1:])
+        if self.items:
+            self.indices = np.concatenate([self._features[item][0] for item in self.items])
+            weights = np.concatenate([self._features[item][1] for item in self.items])
+        else:
+            self.indices = np.zeros(0, dtype=np.int32)
+            weights = np.zeros(0, dtype=np.float32)
+        document_frequency = np.bincount(self.indices, minlength=dimensions)
+        self.idf = (np.log((1.0 + len(self.items)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        data = weights * self.idf[self.indices]
+        row_of = np.repeat(np.arange(len(self.items)), sizes)
+        norms = np.sqrt(np.bincount(row_of, weights=data * data, minlength=len(self.items)))
+        norms[norms == 0] = 1.0
+        self.data = (data / norms[row_of]).astype(np.float32)
+
+    def query_vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in hashed_features(text, self.dimensions).items():
+            vector[feature] = 1.0 + math.log(count)
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def similarities(self, rows: np.ndarray, vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of ``vector`` with each of ``rows``, touching only their stored features."""
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        owners = np.repeat(np.arange(len(rows)), counts)
+        positions = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts - starts, counts)
+        products = self.data[positions] * vector[self.indices[positions]]
+        return np.bincount(owners, weights=products, minlength=len(rows))
+
+    def scores(self, query: str, candidates: Optional[Iterable[Hashable]] = None) -> Dict[Hashable, float]:
+        if not self.items:
+            return {}
+        if candidates is None:
+            items = self.items
+            rows = np.arange(len(items))
+        else:
+            items = [item for item in candidates if item in self.rows]
+            rows = np.fromiter((self.rows[item] for item in items), dtype=np.int64, count=len(items))
+        if not items:
+            return {}
+        similarities = self.similarities(rows, self.query_vector(query))
+        return {items[index]: float(similarities[index]) for index in np.flatnonzero(similarities >= MIN_SIMILARITY)}
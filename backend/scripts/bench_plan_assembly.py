@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Measure the per-request CPU cost of turning a generated plan into the `/api/plan` response body.
+
+Compares the previous dict round trip (`model_dump` -> mutate -> `PlanOut.model_validate`,
+then FastAPI's `response_model` validation and serialisation) with the current path
+(validate the LLM output once, copy in trusted parts, serialise once), for both a mock
+plan and a raw LLM JSON answer. No network or LLM is involved.
+
+Usage:
+    python backend/scripts/bench_plan_assembly.py --iterations 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, List
+
+from pydantic import TypeAdapter
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+# Snippets come from the markdown KB only, so no database is needed.
+os.environ.setdefault("KB_INCLUDE_PUBLISHED", "false")
+
+from app import llm_client  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.kb import retrieve_snippets  # noqa: E402
+from app.plan_service import _assemble_plan  # noqa: E402
+from app.rules import evaluate_rules  # noqa: E402
+from app.schemas import PlanOut, ProfileIn, SourceRef  # noqa: E402
+
+PLAN_ADAPTER = TypeAdapter(PlanOut)
+
+
+def _sample_profile() -> ProfileIn:
+    today = date.today()
+    return ProfileIn(
+        origin_country="CM",
+        destination_country="FR",
+        purpose="STUDY",
+        planned_departure_date=today + timedelta(days=20),
+        duration_months=12,
+        passport_expiry_date=today + timedelta(days=120),
+        has_sponsor=False,
+        proof_of_funds_level="LOW",
+        language="EN",
+    )
+
+
+def _response_model_body(plan: PlanOut) -> bytes:
+    """What FastAPI does with a returned model and ``response_model=PlanOut``."""
+    content = PLAN_ADAPTER.validate_python(plan)
+    return json.dumps(PLAN_ADAPTER.dump_python(content, mode="json")).encode()
+
+
+def _legacy_mock_plan(profile: ProfileIn, snippets: List[dict]) -> dict:
+    """The mock plan as it used to be produced: a freshly built PlanOut, dumped to a dict."""
+    language = profile.language.value
+    return PlanOut(
+        summary=llm_client.MOCK_SUMMARY_FR if language == "FR" else llm_client.MOCK_SUMMARY,
+        timeline=llm_client._mock_timeline(language),
+        checklist=llm_client._mock_checklist(language),
+        documents=llm_client._mock_documents(language),
+        risks=llm_client._mock_risks(language),
+        sources=llm_client.mock_sources(snippets),
+        generated_at=datetime.utcnow().isoformat(),
+    ).model_dump()
+
+
+def _legacy_assemble(profile: ProfileIn, snippets: List[dict], plan_dict: dict) -> bytes:
+    plan_dict["risks"] = (plan_dict.get("risks") or []) + [risk.model_dump() for risk in evaluate_rules(profile)]
+    snippet_sources = [SourceRef(title=s.get("title", ""), ref=s.get("ref", "")) for s in snippets]
+    plan_dict["sources"] = (plan_dict.get("sources") or []) + [s.model_dump() for s in snippet_sources]
+    plan_dict.setdefault("generated_at", datetime.utcnow().isoformat())
+    return _response_model_body(PlanOut.model_validate(plan_dict))
+
+
+def _legacy_parse(raw: str) -> dict:
+    plan_dict = json.loads(raw)
+    plan_dict.setdefault("generated_at", datetime.utcnow().isoformat())
+    return plan_dict
+
+
+def _cpu_us(func: Callable[[], bytes], iterations: int) -> float:
+    for _ in range(min(iterations, 200)):
+        func()
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    profile = _sample_profile()
+    snippets = retrieve_snippets(profile, k=settings.MAX_SNIPPETS)
+    raw_plan = json.dumps(llm_client.build_mock_plan(profile, []).model_dump(mode="json", exclude={"sources"}))
+
+    cases = {
+        "mock": (
+            lambda: _legacy_assemble(profile, snippets, _legacy_mock_plan(profile, snippets)),
+            lambda: llm_client.mock_plan_json(profile, llm_client.mock_sources(snippets), evaluate_rules(profile)),
+        ),
+        "llm": (
+            lambda: _legacy_assemble(profile, snippets, _legacy_parse(raw_plan)),
+            lambda: _assemble_plan(profile, snippets, llm_client._parse_plan(raw_plan)).model_dump_json().encode(),
+        ),
+    }
+    print(f"{'path':<6} {'before_us':>10} {'after_us':>10} {'saved_us':>10} {'speedup':>8}")
+    for name, (before, after) in cases.items():
+        before_us = _cpu_us(before, args.iterations)
+        after_us = _cpu_us(after, args.iterations)
+        print(
+            f"{name:<6} {before_us:>10.1f} {after_us:>10.1f} {before_us - after_us:>10.1f} {before_us / after_us:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible `/v1/chat/completions` stub for offline load and fault testing.
+
+Latency, errors and the shape of the answer are drawn per request, so the real
+HTTP path of the API (pooled client, JSON parsing, circuit breaker, fallback)
+can be exercised without a provider.
+
+Usage:
+    python backend/scripts/llm_stub_server.py --port 9000 --latency lognormal --latency-ms 800 \
+        --error-rate 0.02 --rate-limit-rate 0.01 --invalid-plan-rate 0.05
+    OPENROUTER_API_KEY=stub OPENROUTER_BASE_URL=http://127.0.0.1:9000/v1/chat/completions \
+        MOCK_MODE=false uvicorn app.main:app
+
+GET /stats returns counters of what was served.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+
+from app.llm_client import build_mock_plan  # noqa: E402
+from app.schemas import ProfileIn  # noqa: E402
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+CHAT_ANSWER = (
+    "Gather your passport, proof of funds and admission letter first, then book the earliest visa"
+    " appointment. Bring originals and copies, and keep bank statements covering the last three months."
+)
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency: str = "fixed",
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        sigma: float = 0.5,
+        slow_rate: float = 0.0,
+        slow_ms: float = 10000.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = 1,
+        invalid_plan_rate: float = 0.0,
+        truncated_plan_rate: float = 0.0,
+        chunk_chars: int = 24,
+        chunk_delay_ms: float = 20.0,
+        seed: int | None = None,
+    ) -> None:
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency must be one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.sigma = sigma
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.invalid_plan_rate = invalid_plan_rate
+        self.truncated_plan_rate = truncated_plan_rate
+        self.chunk_chars = chunk_chars
+        self.chunk_delay_ms = chunk_delay_ms
+        self.random = random.Random(seed)
+
+    def sample_latency(self) -> float:
+        """Seconds to wait before answering; ``latency_ms`` is the median (mean for exponential)."""
+        if self.slow_rate and self.random.random() < self.slow_rate:
+            return self.slow_ms / 1000
+        base = self.latency_ms
+        if self.latency == "uniform":
+            value = self.random.uniform(base - self.jitter_ms, base + self.jitter_ms)
+        elif self.latency == "normal":
+            value = self.random.gauss(base, self.jitter_ms)
+        elif self.latency == "lognormal":
+            value = self.random.lognormvariate(math.log(base), self.sigma) if base > 0 else 0.0
+        elif self.latency == "exponential":
+            value = self.random.expovariate(1 / base) if base > 0 else 0.0
+        else:
+            value = base
+        return max(value, 0.0) / 1000
+
+
+def _sample_profile() -> ProfileIn:
+    today = date.today()
+    return ProfileIn(
+        origin_country="CM",
+        destination_country="FR",
+        purpose="STUDY",
+        planned_departure_date=today + timedelta(days=90),
+        duration_months=12,
+        passport_expiry_date=today + timedelta(days=900),
+        has_sponsor=True,
+        proof_of_funds_level="MEDIUM",
+        language="EN",
+    )
+
+
+def _plan_bodies() -> Dict[str, str]:
+    valid = build_mock_plan(_sample_profile(), []).model_dump(mode="json")
+    # Parses as JSON but fails PlanOut validation: wrong types and a missing section.
+    invalid = {**valid, "summary": {"title": 42, "confidence": "high"}, "timeline": "soon"}
+    del invalid["documents"]
+    valid_text = json.dumps(valid)
+    return {
+        "valid": valid_text,
+        "invalid": json.dumps(invalid),
+        "truncated": valid_text[: len(valid_text) // 2],
+    }
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="VisaVerse LLM stub")
+    plans = _plan_bodies()
+    served: Counter = Counter()
+
+    def choose_plan() -> str:
+        roll = config.random.random()
+        if roll < config.invalid_plan_rate:
+            return "invalid"
+        if roll < config.invalid_plan_rate + config.truncated_plan_rate:
+            return "truncated"
+        return "valid"
+
+    def chunks(text: str) -> List[str]:
+        return [text[start : start + config.chunk_chars] for start in range(0, len(text), config.chunk_chars)]
+
+    @app.get("/stats")
+    def stats() -> dict:
+        return dict(served)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        served["requests"] += 1
+        await asyncio.sleep(config.sample_latency())
+
+        roll = config.random.random()
+        if roll < config.rate_limit_rate:
+            served["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            served["errors"] += 1
+            return JSONResponse({"error": {"message": "Upstream failure", "type": "server_error"}}, status_code=500)
+
+        if (payload.get("response_format") or {}).get("type") == "json_object":
+            kind = choose_plan()
+            content = plans[kind]
+            served[f"plan_{kind}"] += 1
+        else:
+            content = CHAT_ANSWER
+            served["chat"] += 1
+
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        model = payload.get("model", "stub")
+        created = int(time.time())
+        if not payload.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+            }
+
+        async def events():
+            for piece in chunks(content):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(config.chunk_delay_ms / 1000)
+            yield "data: [DONE]\n\n"
+
+        served["streams"] += 1
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed", help="Latency distribution.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Median latency (mean for exponential).")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Half-width (uniform) or std dev (normal).")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Shape of the lognormal distribution.")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests that take --slow-ms.")
+    parser.add_argument("--slow-ms", type=float, default=10000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s.")
+    parser.add_argument("--invalid-plan-rate", type=float, default=0.0, help="Plans that fail PlanOut validation.")
+    parser.add_argument("--truncated-plan-rate", type=float, default=0.0, help="Plans cut off mid-JSON.")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="Characters per streamed delta.")
+    parser.add_argument("--chunk-delay-ms", type=float, default=20.0, help="Delay between streamed deltas.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        sigma=args.sigma,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        invalid_plan_rate=args.invalid_plan_rate,
+        truncated_plan_rate=args.truncated_plan_rate,
+        chunk_chars=args.chunk_chars,
+        chunk_delay_ms=args.chunk_delay_ms,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning", ws="none")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def llm_cache_in_tmp(tmp_path_factory):
+    """Keep the shared LLM response cache out of the working tree."""
+    # Imported here, after collection, so test modules can still set env vars before app.config loads.
+    from app.config import settings
+    from app.llm_cache import llm_response_cache
+
+    path = tmp_path_factory.mktemp("llm_cache") / "llm_cache.sqlite3"
+    settings.LLM_CACHE_PATH = str(path)
+    llm_response_cache.close()
+    llm_response_cache.path = path
+    yield path
+    llm_response_cache.close()
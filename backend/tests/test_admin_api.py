@@ -8,8 +8,10 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from fastapi.testclient import TestClient  # noqa: E402
 
+from app.config import settings  # noqa: E402
 from app.main import get_app  # noqa: E402
 from app.database import Base, engine  # noqa: E402
+from app.kb import kb_index  # noqa: E402
 
 Base.metadata.create_all(bind=engine)
 
@@ -17,7 +19,10 @@ app = get_app()
 client = TestClient(app)
 
 
-def test_admin_bootstrap_and_kb_workflow():
+def test_admin_bootstrap_and_kb_workflow(tmp_path, monkeypatch):
+    # Publishing stamps the shared generation file; keep the real one untouched.
+    monkeypatch.setattr(settings, "KB_GENERATION_FILE", str(tmp_path / "kb-generation"))
+    monkeypatch.setattr(kb_index, "generation_file", tmp_path / "kb-generation")
     # bootstrap admin user
     resp = client.post(
         "/admin/api/auth/login",
@@ -42,6 +47,7 @@ def test_admin_bootstrap_and_kb_workflow():
     publish = client.post(f"/admin/api/kb/{doc_id}/publish", headers=headers)
     assert publish.status_code == 200
     assert publish.json()["status"] == "published"
+    assert any(doc.ref.startswith(f"kb_documents/{doc_id}@v") for doc in kb_index.documents())
 
     audit = client.get("/admin/api/audit", headers=headers)
     assert audit.status_code == 200
@@ -1,4 +1,5 @@
 from datetime import date, timedelta
+import json
 import sys
 from pathlib import Path
 
@@ -7,7 +8,10 @@ from fastapi.testclient import TestClient
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from app.config import settings
+from app import concurrency, llm_client, plan_service
 from app.main import app
+from app.rules import evaluate_rules
+from app.schemas import ProfileIn
 
 settings.MOCK_MODE = True
 settings.OPENAI_API_KEY = None
@@ -48,6 +52,13 @@ def test_plan_endpoint_returns_plan_out():
     assert len(data["documents"]) > 0
 
 
+def test_plan_sources_match_kb_named_by_country_codes():
+    response = client.post("/api/plan", json=_sample_profile())
+    assert response.status_code == 200
+    refs = [source["ref"] for source in response.json()["sources"]]
+    assert "country_pairs/cm_to_fr_student.md" in refs
+
+
 def test_chat_endpoint_returns_answer():
     payload = {"message": "How long does processing take?", "profile": _sample_profile()}
     response = client.post("/api/chat", json=payload)
@@ -83,3 +94,145 @@ def test_chat_endpoint_accepts_history_entries():
     data = response.json()
     assert isinstance(data["answer"], str) and data["answer"].strip() != ""
     assert len(data.get("suggested_questions", [])) >= 1
+
+
+def test_chat_without_profile_is_grounded_on_the_question():
+    payload = {"message": "How much should I put in a blocked account?"}
+    response = client.post("/api/chat", json=payload)
+    assert response.status_code == 200
+    refs = [source["ref"] for source in response.json()["sources"]]
+    assert "country_pairs/ng_to_de_student.md" in refs
+
+
+def test_metrics_endpoint_reports_retrieval_cache():
+    client.post("/api/plan", json=_sample_profile())
+    client.post("/api/plan", json=_sample_profile())
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    cache = response.json()["retrieval_cache"]
+    assert cache["hits"] >= 1
+    assert {"misses", "evictions", "size", "maxsize"} <= set(cache)
+
+
+def _sse_events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        name_line, data_line = block.split("\n")
+        events.append((name_line[len("event: ") :], json.loads(data_line[len("data: ") :])))
+    return events
+
+
+def test_chat_stream_sends_sources_before_deltas():
+    payload = {"message": "What about passport validity?", "profile": _sample_profile()}
+    response = client.post("/api/chat/stream", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response)
+    names = [name for name, _ in events]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert events[0][1]["sources"]
+    answer = "".join(data["text"] for name, data in events if name == "delta")
+    assert "passport" in answer
+
+
+def test_plan_stream_emits_rule_output_before_sections():
+    response = client.post("/api/plan/stream", json=_sample_profile())
+    assert response.status_code == 200
+    events = _sse_events(response)
+    names = [name for name, _ in events]
+    assert names == ["sources", "rule_risks", "summary", "timeline", "checklist", "documents", "risks", "done"]
+    refs = [source["ref"] for source in events[0][1]["sources"]]
+    assert "country_pairs/cm_to_fr_student.md" in refs
+    assert events[2][1]["summary"]["confidence"] >= 0
+
+
+def test_plan_stream_validates_llm_sections_and_fills_gaps(monkeypatch):
+    body = json.dumps(
+        {
+            "summary": {"title": "Streamed", "key_advice": ["Apply early"], "confidence": 0.9},
+            "timeline": [{"when": "Week 1"}],
+        }
+    )
+
+    async def fake_stream(prompt, **kwargs):
+        for position in range(0, len(body), 7):
+            yield body[position : position + 7]
+
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(plan_service, "astream_llm", fake_stream)
+    events = dict(_sse_events(client.post("/api/plan/stream", json=_sample_profile())))
+
+    assert events["summary"]["summary"]["title"] == "Streamed"
+    assert events["timeline"]["timeline"][0]["actions"]
+    assert {"checklist", "documents", "risks", "done"} <= set(events)
+
+
+def test_plan_returns_429_when_llm_queue_is_full(monkeypatch):
+    limiter = concurrency.AdaptiveLimiter("openrouter", initial_limit=1, max_queue=0)
+    limiter.acquire()
+    monkeypatch.setattr(concurrency, "_limiters", {"openrouter": limiter})
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "test-key")
+
+    response = client.post("/api/plan", json=_sample_profile(), headers={"Cache-Control": "no-cache"})
+
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    assert response.json()["error"]["code"] == "RATE_LIMITED"
+
+
+def test_plan_fallback_serves_mock_bytes_without_building_a_plan(monkeypatch):
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "test-key")
+
+    async def failing_acall_llm(*args, **kwargs):
+        raise RuntimeError("provider down")
+
+    def unexpected_build(*args, **kwargs):
+        raise AssertionError("the fallback should not build a PlanOut")
+
+    monkeypatch.setattr(llm_client, "acall_llm", failing_acall_llm)
+    monkeypatch.setattr(plan_service, "build_mock_plan", unexpected_build)
+    monkeypatch.setattr(llm_client, "build_mock_plan", unexpected_build)
+
+    response = client.post("/api/plan", json=_sample_profile(), headers={"Cache-Control": "no-cache"})
+
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["summary"] == llm_client.MOCK_SUMMARY
+    assert plan["sources"]
+    # Departing today trips the tight_departure rule; its risk is appended to the mock risks.
+    rule_ids = {risk.id for risk in evaluate_rules(ProfileIn(**_sample_profile()))}
+    assert rule_ids and rule_ids <= {risk["id"] for risk in plan["risks"]}
+
+
+def test_plan_batch_generates_once_per_group_and_reports_item_errors(monkeypatch):
+    calls = []
+    generate_plan = plan_service.agenerate_plan
+
+    async def counting_generate(profile, snippets, use_cache=True):
+        calls.append(profile.destination_country)
+        return await generate_plan(profile, snippets, use_cache=use_cache)
+
+    monkeypatch.setattr(plan_service, "agenerate_plan", counting_generate)
+    profile = _sample_profile()
+    near_copy = {**profile, "notes": "Different notes, same plan"}
+    other = {**profile, "destination_country": "de"}
+    invalid = {**profile, "duration_months": 0}
+
+    response = client.post("/api/plans/batch", json={"profiles": [profile, near_copy, invalid, other, profile]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = {item["index"]: item for item in map(json.loads, response.text.splitlines())}
+    assert sorted(lines) == [0, 1, 2, 3, 4]
+    assert lines[2]["error"]["code"] == "INVALID_PROFILE"
+    assert all("plan" in lines[index] for index in (0, 1, 3, 4))
+    assert sorted(calls) == ["DE", "FR"]
+
+
+def test_plan_batch_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setattr(settings, "PLAN_BATCH_MAX_PROFILES", 1)
+    response = client.post("/api/plans/batch", json={"profiles": [_sample_profile(), _sample_profile()]})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"]["code"] == "BATCH_TOO_LARGE"
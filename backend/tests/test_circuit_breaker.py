@@ -0,0 +1,44 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_opens_after_consecutive_failures_and_rejects_calls():
+    breaker = CircuitBreaker("test", failure_threshold=3, open_seconds=60)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_slow_calls_count_towards_error_rate():
+    breaker = CircuitBreaker("test", failure_threshold=100, error_rate=0.5, window=4, slow_call_seconds=1.0)
+    for duration in (0.1, 5.0, 0.1, 5.0):
+        breaker.record_success(duration)
+
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=0.01, half_open_calls=1)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
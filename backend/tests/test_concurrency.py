@@ -0,0 +1,71 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.concurrency import AdaptiveLimiter, ConcurrencyLimitExceeded, Slot
+
+
+def _finished(latency=None, overloaded=False):
+    slot = Slot()
+    slot.latency = latency
+    slot.overloaded = overloaded
+    return slot
+
+
+def test_limit_grows_additively_and_halves_on_overload():
+    limiter = AdaptiveLimiter("test", initial_limit=4, latency_target=5.0)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(_finished(latency=0.5))
+    assert 4.9 < limiter.limit < 5.1
+
+    limiter.acquire()
+    limiter.release(_finished(overloaded=True))
+    limiter.acquire()
+    limiter.release(_finished(latency=9.0))
+    assert 2.4 < limiter.limit < 2.6
+    assert limiter.stats()["decreases"] == 1
+
+
+def test_full_queue_rejects_immediately_and_waiters_get_released_slots():
+    limiter = AdaptiveLimiter("test", initial_limit=1, max_queue=1, queue_timeout=5.0)
+    limiter.acquire()
+    admitted = threading.Event()
+
+    def wait_for_slot():
+        limiter.acquire()
+        admitted.set()
+
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    while limiter.stats()["queued"] < 1:
+        time.sleep(0.001)
+
+    with pytest.raises(ConcurrencyLimitExceeded) as rejected:
+        limiter.acquire()
+    assert rejected.value.retry_after >= 1
+
+    limiter.release(_finished(latency=0.1))
+    waiter.join(timeout=5)
+    assert admitted.is_set()
+    assert limiter.stats()["in_flight"] == 1
+
+
+def test_async_waiter_times_out_with_retry_after():
+    limiter = AdaptiveLimiter("test", initial_limit=1, max_queue=5, queue_timeout=0.05)
+
+    async def scenario():
+        async with limiter.aslot():
+            with pytest.raises(ConcurrencyLimitExceeded):
+                await limiter.aacquire()
+        await limiter.aacquire()
+
+    asyncio.run(scenario())
+    assert limiter.stats()["timed_out"] == 1
+    assert limiter.stats()["queued"] == 0
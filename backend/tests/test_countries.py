@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.countries import canonical_country, country_label, country_names
+from app.kb import _metadata_key
+
+
+def test_codes_and_en_fr_names_share_one_canonical_id():
+    variants = ["cm", "CMR", "Cameroon", "cameroun", " Cameroun "]
+    assert {canonical_country(value) for value in variants} == {"CM"}
+    assert canonical_country("uk") == canonical_country("Royaume-Uni") == "GB"
+    assert canonical_country("Bresil") == canonical_country("Brésil") == "BR"
+    assert canonical_country("Atlantis") == "Atlantis"
+
+
+def test_names_and_labels_for_prompts_and_queries():
+    assert country_names("sn") == ["Senegal", "Sénégal"]
+    assert country_names("fr") == ["France"]
+    assert country_label("ng") == "Nigeria (NG)"
+
+
+def test_kb_metadata_and_profiles_use_the_same_country_keys():
+    assert _metadata_key({"origin_country": "Nigeria", "destination_country": "de", "purpose": "STUDY"}) == (
+        "ng",
+        "de",
+        "study",
+        "",
+    )
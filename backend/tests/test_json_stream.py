@@ -0,0 +1,27 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.json_stream import TopLevelJsonParser
+
+
+def test_parser_emits_members_as_soon_as_they_complete():
+    plan = {
+        "summary": {"title": "Plan {draft}", "key_advice": ["Say \"hi\", then go"]},
+        "timeline": [{"when": "Week 1", "actions": ["a", "b"]}],
+        "generated_at": "2025-02-01",
+    }
+    text = "```json\n" + json.dumps(plan, indent=2) + "\n```"
+    parser = TopLevelJsonParser()
+
+    seen = []
+    for position in range(len(text)):
+        for key, value in parser.feed(text[position]):
+            seen.append((key, value))
+            if key == "summary":
+                assert '"timeline"' not in text[: position + 1]
+
+    assert seen == list(plan.items())
+    assert parser.finished
@@ -0,0 +1,319 @@
+from datetime import date, timedelta
+import sys
+from pathlib import Path
+
+from sqlalchemy.exc import SQLAlchemyError
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings
+from app import kb
+from app.build_kb_index import build_index
+from app.kb import IndexedDocument, KbIndex, bump_generation, retrieve_for_query, retrieve_snippets, split_sections
+from app.ranking import Bm25Index, term_counts
+from app.schemas import ProfileIn
+
+
+def _profile(**overrides) -> ProfileIn:
+    today = date.today()
+    data = {
+        "origin_country": "Nigeria",
+        "destination_country": "Germany",
+        "purpose": "STUDY",
+        "planned_departure_date": today + timedelta(days=90),
+        "duration_months": 12,
+        "passport_expiry_date": today + timedelta(days=900),
+        "has_sponsor": False,
+        "proof_of_funds_level": "MEDIUM",
+        "language": "EN",
+    }
+    data.update(overrides)
+    return ProfileIn(**data)
+
+
+def _write_kb(root: Path) -> None:
+    (root / "country_pairs").mkdir()
+    (root / "country_pairs" / "ng_to_de_student.md").write_text(
+        "---\norigin_country: Nigeria\ndestination_country: Germany\npurpose: STUDY\nlanguage: EN\n---\n"
+        "# Nigeria to Germany\n\n- Open a blocked account before the Germany study visa appointment.\n",
+        encoding="utf-8",
+    )
+    (root / "country_pairs" / "in_to_ca_work.md").write_text(
+        "---\norigin_country: India\ndestination_country: Canada\npurpose: WORK\nlanguage: EN\n---\n"
+        "# India to Canada\n\n- Book biometrics early.\n",
+        encoding="utf-8",
+    )
+    (root / "global_documents.md").write_text(
+        "# Global\n\n- Passport valid for study in Germany.\n", encoding="utf-8"
+    )
+
+
+def test_index_serves_snippets_from_memory(tmp_path):
+    _write_kb(tmp_path)
+    index = KbIndex(tmp_path)
+
+    snippets = retrieve_snippets(_profile(), k=5, index=index)
+
+    refs = [snippet["ref"] for snippet in snippets]
+    assert refs[0] == str(Path("country_pairs") / "ng_to_de_student.md")
+    assert "global_documents.md" in refs
+    assert all("in_to_ca" not in ref for ref in refs)
+    assert snippets[0]["metadata"]["destination_country"] == "Germany"
+
+
+def test_index_reloads_only_changed_files(tmp_path):
+    _write_kb(tmp_path)
+    index = KbIndex(tmp_path)
+    before = {doc.ref: doc for doc in index.documents()}
+    generation = index.generation
+
+    changed = tmp_path / "global_documents.md"
+    changed.write_text("# Global\n\n- Passport and travel insurance for Germany study.\n", encoding="utf-8")
+    after = {doc.ref: doc for doc in index.documents()}
+
+    assert index.generation == generation + 1
+    assert after["global_documents.md"] is not before["global_documents.md"]
+    assert "insurance" in after["global_documents.md"].content
+    unchanged = str(Path("country_pairs") / "in_to_ca_work.md")
+    assert after[unchanged] is before[unchanged]
+
+
+def test_index_skips_rescan_within_refresh_interval(tmp_path):
+    _write_kb(tmp_path)
+    index = KbIndex(tmp_path, refresh_interval=3600)
+    assert len(index.documents()) == 3
+
+    (tmp_path / "extra.md").write_text("# Extra\n", encoding="utf-8")
+    assert len(index.documents()) == 3
+
+    index.refresh(force=True)
+    assert len(index.documents()) == 4
+
+
+def test_candidates_use_metadata_buckets_with_wildcards(tmp_path):
+    _write_kb(tmp_path)
+    (tmp_path / "any_to_de.md").write_text(
+        "---\ndestination_country: germany\nlanguage: EN\n---\n# Germany\n\n- Register your address.\n", encoding="utf-8"
+    )
+    index = KbIndex(tmp_path)
+
+    refs = sorted({chunk.document.ref for chunk in index.candidates(_profile())})
+
+    assert refs == sorted(
+        ["any_to_de.md", "global_documents.md", str(Path("country_pairs") / "ng_to_de_student.md")]
+    )
+    assert {chunk.document.ref for chunk in index.candidates(_profile(language="FR"))} == {"global_documents.md"}
+
+
+def test_bm25_prefers_focused_documents_over_long_ones():
+    index = Bm25Index(
+        [
+            ("focused", term_counts("Germany student visa: blocked account for Germany.")),
+            ("long", term_counts("Germany " * 3 + "filler text " * 200)),
+            ("other", term_counts("Canada work permit biometrics.")),
+        ]
+    )
+
+    top = index.top_k(["germany", "student"], k=2)
+
+    assert [doc for doc, _ in top] == ["focused", "long"]
+    assert index.top_k(["germany"], k=5, candidates=["other"]) == []
+
+
+def test_keyword_scorer_remains_available(tmp_path, monkeypatch):
+    _write_kb(tmp_path)
+    index = KbIndex(tmp_path)
+    monkeypatch.setattr(settings, "KB_SCORER", "keyword")
+
+    snippets = retrieve_snippets(_profile(), k=5, index=index)
+
+    assert snippets[0]["ref"] == str(Path("country_pairs") / "ng_to_de_student.md")
+    assert isinstance(snippets[0]["score"], int)
+
+
+def test_split_sections_keeps_heading_trail():
+    sections = split_sections("# Title\n\nIntro line\n\n## Steps\n1. First\n   continued\n2. Second\n- Third\n")
+
+    assert sections == [
+        (("# Title",), "Intro line"),
+        (("# Title", "## Steps"), "1. First\ncontinued"),
+        (("# Title", "## Steps"), "2. Second"),
+        (("# Title", "## Steps"), "- Third"),
+    ]
+
+
+def test_retrieval_returns_best_chunks_within_budget(tmp_path, monkeypatch):
+    _write_kb(tmp_path)
+    (tmp_path / "country_pairs" / "ng_to_de_student.md").write_text(
+        "---\norigin_country: Nigeria\ndestination_country: Germany\npurpose: STUDY\nlanguage: EN\n---\n"
+        "# Nigeria to Germany\n\n## Money\n- Blocked account for study in Germany.\n\n## Misc\n"
+        + "".join(f"- Unrelated advice number {i} about packing.\n" for i in range(20)),
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(settings, "KB_SNIPPET_CHAR_BUDGET", 120)
+    index = KbIndex(tmp_path)
+
+    snippets = retrieve_snippets(_profile(), k=5, index=index)
+
+    assert sum(len(snippet["content"]) for snippet in snippets) < 400
+    by_ref = {snippet["ref"]: snippet["content"] for snippet in snippets}
+    pair = by_ref[str(Path("country_pairs") / "ng_to_de_student.md")]
+    assert pair.startswith("# Nigeria to Germany\n## Money\n- Blocked account")
+
+
+def test_published_versions_override_files_and_reach_other_workers(tmp_path, monkeypatch):
+    kb_root = tmp_path / "kb"
+    kb_root.mkdir()
+    _write_kb(kb_root)
+    published = []
+    monkeypatch.setattr(kb, "load_published_documents", lambda: list(published))
+    generation_file = tmp_path / "generation"
+    publisher = KbIndex(kb_root, generation_file=generation_file, include_published=True)
+    worker = KbIndex(kb_root, generation_file=generation_file, include_published=True)
+    assert len(worker.documents()) == 3
+
+    published.append(
+        IndexedDocument.parse("kb_documents/7@v2", "Global Documents", "- Published Germany study guidance.", 2)
+    )
+    publisher.publish()
+
+    refs = {doc.ref for doc in worker.documents()}
+    assert "kb_documents/7@v2" in refs
+    assert "global_documents.md" not in refs
+    snippets = retrieve_snippets(_profile(), k=5, index=worker)
+    assert "kb_documents/7@v2" in [snippet["ref"] for snippet in snippets]
+
+
+def test_prebuilt_artifact_matches_file_retrieval(tmp_path):
+    kb_root = tmp_path / "kb"
+    kb_root.mkdir()
+    _write_kb(kb_root)
+    artifact_path = tmp_path / "kb_index.bin"
+    assert build_index(kb_root, artifact_path) == 3
+
+    mapped = KbIndex(kb_root, artifact_path=artifact_path)
+    from_files = KbIndex(kb_root)
+
+    assert all(chunk._span is not None for doc in mapped.documents() for chunk in doc.chunks)
+    mapped_snippets = retrieve_snippets(_profile(), k=5, index=mapped)
+    file_snippets = retrieve_snippets(_profile(), k=5, index=from_files)
+    assert [(s["ref"], s["content"], s["metadata"]) for s in mapped_snippets] == [
+        (s["ref"], s["content"], s["metadata"]) for s in file_snippets
+    ]
+    assert [round(s["score"], 6) for s in mapped_snippets] == [round(s["score"], 6) for s in file_snippets]
+
+
+def test_artifact_postings_are_decoded_per_query_term(tmp_path):
+    kb_root = tmp_path / "kb"
+    kb_root.mkdir()
+    _write_kb(kb_root)
+    artifact_path = tmp_path / "kb_index.bin"
+    build_index(kb_root, artifact_path)
+    documents, index = kb.load_artifact(artifact_path)
+    assert index.postings._decoded == {}
+
+    index.scores(["germany", "absent"])
+
+    assert set(index.postings._decoded) == {"germany"}
+    assert "germany" in set(index.postings) and len(index.postings) > 1
+
+    published = IndexedDocument.parse("kb_documents/7@v2", "Global Documents", "- Published Germany guidance.", 2)
+    replaced = [chunk for document in documents if document.title == "Global Documents" for chunk in document.chunks]
+    merged = index.merged(((chunk, chunk.terms) for chunk in published.chunks), replaced)
+    assert published.chunks[0] in merged.postings["germany"]
+    assert not set(replaced) & set(merged.postings["germany"])
+    assert set(index.postings._decoded) == {"germany"}
+
+
+def test_semantic_mode_matches_related_wording_in_en_and_fr(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "KB_SNIPPET_CHAR_BUDGET", 60)
+    (tmp_path / "fr.md").write_text(
+        "---\nlanguage: FR\n---\n# Conseils\n\n- Prendre rendez-vous pour la biométrie au centre.\n"
+        "- Réserver un hôtel pour tout le séjour.\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "en.md").write_text(
+        "---\nlanguage: EN\n---\n# Tips\n\n- Book biometrics right after the request letter.\n"
+        "- Keep payslips as proof of income.\n",
+        encoding="utf-8",
+    )
+    index = KbIndex(tmp_path)
+
+    en = retrieve_snippets(_profile(notes="biometric enrolment"), k=1, index=index, mode="semantic")
+    fr = retrieve_snippets(_profile(language="FR", notes="biometrie"), k=1, index=index, mode="semantic")
+
+    assert en[0]["content"] == "# Tips\n- Book biometrics right after the request letter."
+    assert fr[0]["content"] == "# Conseils\n- Prendre rendez-vous pour la biométrie au centre."
+
+
+def test_semantic_index_is_built_at_swap_and_scores_candidate_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_RETRIEVAL_MODE", "semantic")
+    _write_kb(tmp_path)
+    index = KbIndex(tmp_path)
+    first = index.snapshot()
+    assert first._semantic is not None
+
+    (tmp_path / "global_documents.md").write_text("# Global\n\n- Biometrics for Germany.\n", encoding="utf-8")
+    second = index.snapshot()
+    semantic = second._semantic
+    unchanged = [chunk for chunk in second.chunks if chunk.document.ref != "global_documents.md"]
+    assert all(semantic._features[chunk] is first._semantic._features[chunk] for chunk in unchanged)
+    assert semantic.indices.size < len(second.chunks) * semantic.dimensions
+
+    everything = semantic.scores("biometrics germany")
+    candidates = second.candidates(_profile())
+    restricted = semantic.scores("biometrics germany", candidates)
+    assert restricted and set(restricted) <= set(candidates)
+    assert restricted == {chunk: score for chunk, score in everything.items() if chunk in set(candidates)}
+
+
+def test_query_retrieval_uses_message_terms_with_or_without_profile(tmp_path):
+    _write_kb(tmp_path)
+    index = KbIndex(tmp_path)
+
+    anonymous = retrieve_for_query("When should I book my biometrics?", k=1, index=index)
+    filtered = retrieve_for_query("When should I book my biometrics?", _profile(), k=5, index=index)
+
+    assert anonymous[0]["ref"] == str(Path("country_pairs") / "in_to_ca_work.md")
+    assert all("in_to_ca" not in snippet["ref"] for snippet in filtered)
+
+
+def test_retrieval_cache_hits_on_normalised_profile_and_resets_on_kb_change(tmp_path):
+    _write_kb(tmp_path)
+    index = KbIndex(tmp_path, cache_size=2)
+
+    first = retrieve_snippets(_profile(), k=5, index=index)
+    again = retrieve_snippets(_profile(origin_country=" NIGERIA "), k=5, index=index)
+    retrieve_snippets(_profile(), k=2, index=index)
+    retrieve_snippets(_profile(purpose="WORK"), k=5, index=index)
+
+    assert again == first
+    stats = index.retrieval_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+
+    (tmp_path / "global_documents.md").write_text("# Global\n\n- Germany study insurance.\n", encoding="utf-8")
+    refreshed = retrieve_snippets(_profile(), k=5, index=index)
+    assert "insurance" in {snippet["ref"]: snippet["content"] for snippet in refreshed}["global_documents.md"]
+
+
+def test_published_load_failures_back_off(tmp_path, monkeypatch):
+    kb_root = tmp_path / "kb"
+    kb_root.mkdir()
+    _write_kb(kb_root)
+    calls = []
+
+    def failing_load():
+        calls.append(1)
+        raise SQLAlchemyError("no such table: kb_documents")
+
+    monkeypatch.setattr(kb, "load_published_documents", failing_load)
+    index = KbIndex(kb_root, generation_file=tmp_path / "generation", include_published=True)
+    assert len(index.documents()) == 3
+    index._checked_at = None
+    index.documents()
+    assert len(calls) == 1
+
+    bump_generation(tmp_path / "generation")
+    index._checked_at = None
+    index.documents()
+    assert len(calls) == 2
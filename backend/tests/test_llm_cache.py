@@ -0,0 +1,71 @@
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.llm_cache import LlmResponseCache, cache_key
+
+
+def _payload(prompt, temperature=0.2):
+    return {"model": "m", "messages": [{"role": "user", "content": prompt}], "temperature": temperature}
+
+
+def test_key_depends_on_every_request_field():
+    assert cache_key(_payload("a")) == cache_key(_payload("a"))
+    assert cache_key(_payload("a")) != cache_key(_payload("b"))
+    assert cache_key(_payload("a")) != cache_key(_payload("a", temperature=0.4))
+    assert cache_key(_payload("a")) != cache_key({**_payload("a"), "response_format": {"type": "json_object"}})
+
+
+def test_cache_evicts_least_recently_used_and_persists(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = LlmResponseCache(path, max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+    cache.close()
+
+    reopened = LlmResponseCache(path, max_entries=2)
+    assert reopened.get("b") is None
+    assert (reopened.get("a"), reopened.get("c")) == ("A", "C")
+
+
+def test_cache_expires_entries_after_ttl(tmp_path):
+    cache = LlmResponseCache(tmp_path / "cache.sqlite3", ttl=0.01)
+    cache.set("a", "A")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_hits_do_not_write_until_flushed(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = LlmResponseCache(path, touch_batch=100)
+    cache.set("a", "A")
+    reader = sqlite3.connect(str(path))
+    written = reader.execute("SELECT accessed_at FROM llm_responses").fetchone()[0]
+
+    assert cache.get("a") == "A"
+    assert reader.execute("SELECT accessed_at FROM llm_responses").fetchone()[0] == written
+    cache.close()
+    assert reader.execute("SELECT accessed_at FROM llm_responses").fetchone()[0] > written
+
+
+def test_cache_survives_a_locked_database(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = LlmResponseCache(path, touch_batch=1)
+    cache.set("a", "A")
+    locker = sqlite3.connect(str(path), timeout=0)
+    locker.execute("BEGIN EXCLUSIVE")
+    cache._connect().execute("PRAGMA busy_timeout = 0")
+
+    assert cache.get("a") == "A"
+    cache.set("b", "B")
+    locker.rollback()
+
+    assert cache.stats()["errors"] == 2
+    assert cache.get("b") is None
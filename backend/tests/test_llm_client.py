@@ -0,0 +1,357 @@
+import asyncio
+import http.server
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import circuit_breaker, concurrency, llm_client
+from app.concurrency import AdaptiveLimiter
+from app.llm_router import LlmRouter, Provider
+from app.llm_cache import LlmResponseCache
+from app.config import settings
+from app.rules import evaluate_rules
+from app.schemas import PlanOut, ProfileIn
+
+
+class _CompletionHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+        if request.get("stream"):
+            chunks = [{"choices": [{"delta": {"content": word}}]} for word in ("hel", "lo")]
+            body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps({"choices": [{"message": {"content": "hello"}}]})
+            content_type = "application/json"
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _SlowCompletionHandler(_CompletionHandler):
+    def do_POST(self):
+        time.sleep(1.0)
+        super().do_POST()
+
+
+@pytest.fixture
+def llm_server(monkeypatch, tmp_path):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _CompletionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "OPENROUTER_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1/chat/completions")
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(llm_client, "llm_response_cache", LlmResponseCache(tmp_path / "llm_cache.sqlite3"))
+    llm_client.close_http_client()
+    yield server
+    llm_client.close_http_client()
+    server.shutdown()
+
+
+def test_call_llm_reuses_pooled_connection(llm_server):
+    before = llm_client.connection_stats.stats()
+
+    answers = [llm_client.call_llm("hi", system_prompt="test", use_cache=False) for _ in range(3)]
+
+    after = llm_client.connection_stats.stats()
+    assert answers == ["hello"] * 3
+    assert after["requests"] - before["requests"] == 3
+    assert after["new_connections"] - before["new_connections"] == 1
+
+
+def test_acall_llm_runs_requests_concurrently(llm_server):
+    async def ask_all():
+        try:
+            return await asyncio.gather(
+                *(llm_client.acall_llm(f"hi {n}", system_prompt="test") for n in range(5))
+            )
+        finally:
+            await llm_client.aclose_http_client()
+
+    assert asyncio.run(ask_all()) == ["hello"] * 5
+
+
+def test_astream_llm_yields_deltas(llm_server):
+    async def collect():
+        try:
+            return [delta async for delta in llm_client.astream_llm("hi", system_prompt="test")]
+        finally:
+            await llm_client.aclose_http_client()
+
+    assert asyncio.run(collect()) == ["hel", "lo"]
+
+
+def test_call_llm_serves_repeated_prompts_from_cache(llm_server):
+    before = llm_client.connection_stats.stats()["requests"]
+
+    first = llm_client.call_llm("same prompt", system_prompt="test")
+    second = llm_client.call_llm("same prompt", system_prompt="test")
+    bypassed = llm_client.call_llm("same prompt", system_prompt="test", use_cache=False)
+
+    assert first == second == bypassed == "hello"
+    assert llm_client.connection_stats.stats()["requests"] - before == 2
+    stats = llm_client.llm_response_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_open_circuit_skips_provider_and_plan_falls_back_to_mock(llm_server, monkeypatch):
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    breaker = circuit_breaker.get_circuit_breaker(settings.llm_mode)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    before = llm_client.connection_stats.stats()["requests"]
+
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        llm_client.call_llm("hi", system_prompt="test", use_cache=False)
+    profile = ProfileIn(
+        origin_country="CM",
+        destination_country="FR",
+        purpose="STUDY",
+        planned_departure_date="2030-01-01",
+        duration_months=6,
+        passport_expiry_date="2031-01-01",
+        has_sponsor=True,
+        proof_of_funds_level="HIGH",
+        language="EN",
+    )
+    plan = llm_client.generate_plan(profile, [])
+
+    assert plan.summary.model_dump() == llm_client.MOCK_SUMMARY
+    assert llm_client.connection_stats.stats()["requests"] == before
+
+
+def test_acall_llm_hedges_slow_provider(llm_server, monkeypatch):
+    slow = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _SlowCompletionHandler)
+    threading.Thread(target=slow.serve_forever, daemon=True).start()
+    fast_url = settings.OPENROUTER_BASE_URL
+    providers = [
+        Provider("slow", f"http://127.0.0.1:{slow.server_port}/v1/chat/completions", {}, "slow-model"),
+        Provider("fast", fast_url, {}, "fast-model"),
+    ]
+    router = LlmRouter(min_hedge_delay=0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_ROUTING", "static")
+    monkeypatch.setattr(llm_client, "configured_providers", lambda: providers)
+    monkeypatch.setattr(llm_client, "llm_router", router)
+
+    async def ask():
+        try:
+            start = time.perf_counter()
+            answer = await llm_client.acall_llm("hedged", system_prompt="test", use_cache=False)
+            return answer, time.perf_counter() - start
+        finally:
+            await llm_client.aclose_http_client()
+
+    try:
+        answer, elapsed = asyncio.run(ask())
+    finally:
+        slow.shutdown()
+
+    assert answer == "hello"
+    assert elapsed < 0.9
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+    # The cancelled loser counts as a latency sample, not as a failure.
+    slow_stats = router.stats()["providers"]["slow"]
+    assert (slow_stats["calls"], slow_stats["error_rate"]) == (1, 0.0)
+    assert slow_stats["p50_seconds"] >= 0.05
+    assert circuit_breaker.get_circuit_breaker("slow").stats()["state"] == "closed"
+
+
+def test_hedged_loser_latency_demotes_slow_primary(llm_server, monkeypatch):
+    slow = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _SlowCompletionHandler)
+    threading.Thread(target=slow.serve_forever, daemon=True).start()
+    providers = [
+        Provider("slow", f"http://127.0.0.1:{slow.server_port}/v1/chat/completions", {}, "slow-model"),
+        Provider("fast", settings.OPENROUTER_BASE_URL, {}, "fast-model"),
+    ]
+    router = LlmRouter(min_hedge_delay=0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_ROUTING", "latency")
+    monkeypatch.setattr(llm_client, "configured_providers", lambda: providers)
+    monkeypatch.setattr(llm_client, "llm_router", router)
+
+    async def ask_many():
+        try:
+            for _ in range(10):
+                await llm_client.acall_llm("hedged", system_prompt="test", use_cache=False)
+        finally:
+            await llm_client.aclose_http_client()
+
+    try:
+        asyncio.run(ask_many())
+    finally:
+        slow.shutdown()
+
+    assert router.ranked(providers)[0].name == "fast"
+    assert router.hedges < 10
+
+
+def test_cache_key_survives_an_open_circuit(monkeypatch, tmp_path):
+    providers = [Provider("first", "http://first", {}, "m1"), Provider("second", "http://second", {}, "m2")]
+    posted = []
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(llm_client, "configured_providers", lambda: providers)
+    monkeypatch.setattr(llm_client, "llm_router", LlmRouter())
+    monkeypatch.setattr(llm_client, "llm_response_cache", LlmResponseCache(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.setattr(llm_client, "_post", lambda provider, payload, timeout: posted.append(provider.name) or "hi")
+
+    assert llm_client.call_llm("cached", system_prompt="test") == "hi"
+    breaker = circuit_breaker.get_circuit_breaker("first")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    assert llm_client.call_llm("cached", system_prompt="test") == "hi"
+    assert posted == ["first"]
+
+
+def test_section_mode_falls_back_per_section(monkeypatch):
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "PLAN_GENERATION_MODE", "sections")
+    prompts = []
+
+    async def fake_acall_llm(prompt, parse, **kwargs):
+        prompts.append(prompt)
+        if "keys exactly: summary, timeline." in prompt:
+            return parse(json.dumps({
+                "summary": {"title": "From the model", "key_advice": [], "assumptions": [], "confidence": 0.9},
+                "timeline": [{"when": "Week 1", "actions": ["Apply"], "priority": "HIGH"}],
+            }))
+        if "keys exactly: documents, risks." in prompt:
+            return parse(json.dumps({
+                "documents": "not a list",
+                "risks": [{
+                    "id": "model_risk", "risk": "Late", "why_it_matters": "Queues",
+                    "mitigation": ["Book early"], "severity": "LOW",
+                }],
+            }))
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(llm_client, "acall_llm", fake_acall_llm)
+    profile = ProfileIn(
+        origin_country="CM",
+        destination_country="FR",
+        purpose="STUDY",
+        planned_departure_date="2030-01-01",
+        duration_months=6,
+        passport_expiry_date="2032-01-01",
+        has_sponsor=True,
+        proof_of_funds_level="HIGH",
+        language="EN",
+    )
+
+    plan = asyncio.run(llm_client.agenerate_plan(profile, [])).model_dump()
+
+    mock_plan = llm_client.build_mock_plan(profile, []).model_dump()
+    assert len(prompts) == len(llm_client.PLAN_SECTION_GROUPS)
+    assert plan["summary"]["title"] == "From the model"
+    assert plan["timeline"][0]["when"] == "Week 1"
+    assert plan["checklist"] == mock_plan["checklist"]
+    assert plan["documents"] == mock_plan["documents"]
+    assert [risk["id"] for risk in plan["risks"]] == ["model_risk"]
+
+
+def test_mock_plan_json_matches_mock_plan_with_rule_risks():
+    profile = ProfileIn(
+        origin_country="CM",
+        destination_country="FR",
+        purpose="STUDY",
+        planned_departure_date="2030-01-01",
+        duration_months=6,
+        passport_expiry_date="2030-03-01",
+        has_sponsor=False,
+        proof_of_funds_level="LOW",
+        language="FR",
+    )
+    snippets = [{"title": "Cm To Fr Student", "ref": "country_pairs/cm_to_fr_student.md"}]
+    rule_risks = evaluate_rules(profile)
+
+    plan = PlanOut.model_validate_json(
+        llm_client.mock_plan_json(profile, llm_client.mock_sources(snippets), rule_risks)
+    )
+
+    expected = llm_client.build_mock_plan(profile, snippets)
+    assert rule_risks
+    assert plan.risks == expected.risks + rule_risks
+    assert plan.model_dump(exclude={"risks", "generated_at"}) == expected.model_dump(exclude={"risks", "generated_at"})
+
+
+def test_open_circuit_fails_fast_while_limiter_slots_are_held(llm_server, monkeypatch):
+    limiter = AdaptiveLimiter("openrouter", initial_limit=1, min_limit=1, queue_timeout=2.0)
+    monkeypatch.setattr(concurrency, "_limiters", {"openrouter": limiter})
+    limiter.acquire()
+    breaker = circuit_breaker.get_circuit_breaker("openrouter")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    start = time.perf_counter()
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        llm_client.call_llm("hi", system_prompt="test", use_cache=False)
+    assert time.perf_counter() - start < 0.5
+    assert limiter.stats()["queued"] == 0
+
+
+def test_hedged_call_reports_limiter_rejection_over_provider_error(monkeypatch):
+    providers = [Provider("busy", "http://busy", {}, "m1"), Provider("broken", "http://broken", {}, "m2")]
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(llm_client, "llm_router", LlmRouter(min_hedge_delay=0.01))
+
+    async def fake_apost(provider, payload, timeout):
+        if provider.name == "busy":
+            raise concurrency.ConcurrencyLimitExceeded("busy is at capacity", retry_after=3)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream 500")
+
+    monkeypatch.setattr(llm_client, "_apost", fake_apost)
+
+    with pytest.raises(concurrency.ConcurrencyLimitExceeded):
+        asyncio.run(llm_client._apost_hedged(providers, {}, timeout=1.0))
+
+
+def test_mock_plans_do_not_share_mutable_state():
+    profile = ProfileIn(
+        origin_country="CM",
+        destination_country="FR",
+        purpose="STUDY",
+        planned_departure_date="2030-01-01",
+        duration_months=6,
+        passport_expiry_date="2032-01-01",
+        has_sponsor=True,
+        proof_of_funds_level="HIGH",
+        language="EN",
+    )
+    first = llm_client.build_mock_plan(profile, [])
+    first.timeline[0].actions.append("Injected")
+    first.risks.clear()
+    first.summary.key_advice[0] = "Changed"
+
+    second = llm_client.build_mock_plan(profile, [])
+    assert "Injected" not in second.timeline[0].actions
+    assert second.risks
+    assert second.summary.key_advice[0] == llm_client.MOCK_SUMMARY["key_advice"][0]
+
+
+def test_http2_setting_falls_back_when_h2_is_missing(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HTTP2", True)
+    monkeypatch.setitem(sys.modules, "h2", None)
+    assert llm_client._use_http2() is False
+    llm_client.close_http_client()
+    try:
+        assert not llm_client.open_http_client().is_closed
+    finally:
+        llm_client.close_http_client()
@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import circuit_breaker
+from app.config import settings
+from app.llm_router import LlmRouter, Provider
+
+
+def test_router_prefers_fast_healthy_provider(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(settings, "LLM_ROUTING", "latency")
+    first = Provider("first", "http://first", {}, "m1")
+    second = Provider("second", "http://second", {}, "m2")
+    router = LlmRouter()
+    for _ in range(5):
+        router.record(first, 2.0, ok=True)
+        router.record(second, 0.5, ok=True)
+
+    assert [provider.name for provider in router.ranked([first, second])] == ["second", "first"]
+
+    for _ in range(3):
+        router.record(second, 0.5, ok=False)
+    breaker = circuit_breaker.get_circuit_breaker("second")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    assert [provider.name for provider in router.ranked([first, second])] == ["first"]
+
+
+def test_provider_with_only_failures_ranks_last(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(settings, "LLM_ROUTING", "latency")
+    failing = Provider("failing", "http://failing", {}, "m1")
+    working = Provider("working", "http://working", {}, "m2")
+    fresh = Provider("fresh", "http://fresh", {}, "m3")
+    router = LlmRouter()
+    for _ in range(4):
+        router.record(failing, 0.1, ok=False)
+    for _ in range(3):
+        router.record(working, 1.5, ok=True)
+
+    assert [provider.name for provider in router.ranked([failing, working, fresh])] == ["fresh", "working", "failing"]
+
+
+def test_hedge_delay_tracks_latency_percentile():
+    provider = Provider("p", "http://p", {}, "m")
+    router = LlmRouter(hedge_percentile=0.9, min_hedge_delay=0.1)
+    assert router.hedge_delay(provider) == 0.1
+    for latency in range(1, 11):
+        router.record(provider, float(latency), ok=True)
+    assert router.hedge_delay(provider) == 9.0
+
+
+def test_stale_latency_samples_expire_so_unused_providers_get_retried(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(settings, "LLM_ROUTING", "latency")
+    now = [0.0]
+    first = Provider("first", "http://first", {}, "m1")
+    second = Provider("second", "http://second", {}, "m2")
+    router = LlmRouter(max_age=60.0, clock=lambda: now[0])
+    router.record(first, 5.0, ok=True)
+    router.record(second, 1.0, ok=True)
+    now[0] = 45.0
+    router.record(second, 1.0, ok=True)
+    assert [provider.name for provider in router.ranked([first, second])] == ["second", "first"]
+
+    now[0] = 90.0
+    assert [provider.name for provider in router.ranked([first, second])] == ["first", "second"]
+    assert router.stats()["providers"]["first"]["calls"] == 0
@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from app import circuit_breaker, llm_client
+from app.config import settings
+from app.llm_cache import LlmResponseCache
+from app.schemas import PlanOut
+from scripts.llm_stub_server import StubConfig, _sample_profile, create_app
+
+PLAN_REQUEST = {"model": "stub", "messages": [], "response_format": {"type": "json_object"}}
+
+
+def test_stub_serves_valid_invalid_and_streamed_plans():
+    valid = TestClient(create_app(StubConfig(seed=1)))
+    content = valid.post("/v1/chat/completions", json=PLAN_REQUEST).json()["choices"][0]["message"]["content"]
+    PlanOut.model_validate_json(content)
+
+    invalid = TestClient(create_app(StubConfig(invalid_plan_rate=1.0)))
+    content = invalid.post("/v1/chat/completions", json=PLAN_REQUEST).json()["choices"][0]["message"]["content"]
+    with pytest.raises(ValueError):
+        PlanOut.model_validate_json(content)
+
+    streamed = TestClient(create_app(StubConfig(chunk_delay_ms=0)))
+    response = streamed.post("/v1/chat/completions", json={**PLAN_REQUEST, "stream": True})
+    lines = [line[len("data: ") :] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert lines[-1] == "[DONE]"
+    PlanOut.model_validate_json("".join(json.loads(line)["choices"][0]["delta"]["content"] for line in lines[:-1]))
+
+
+def test_stub_returns_rate_limits_with_retry_after():
+    client = TestClient(create_app(StubConfig(rate_limit_rate=1.0, retry_after=3)))
+    response = client.post("/v1/chat/completions", json={"messages": []})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+    assert client.get("/stats").json() == {"requests": 1, "rate_limited": 1}
+
+
+@pytest.fixture
+def stub_provider(monkeypatch, tmp_path):
+    servers = []
+
+    def start(config):
+        server = uvicorn.Server(
+            uvicorn.Config(create_app(config), host="127.0.0.1", port=0, log_level="warning", ws="none")
+        )
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        servers.append(server)
+        monkeypatch.setattr(settings, "OPENROUTER_BASE_URL", f"http://127.0.0.1:{port}/v1/chat/completions")
+        return server
+
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "stub")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(llm_client, "llm_response_cache", LlmResponseCache(tmp_path / "cache.sqlite3"))
+    llm_client.close_http_client()
+    yield start
+    llm_client.close_http_client()
+    for server in servers:
+        server.should_exit = True
+
+
+def test_generate_plan_runs_the_real_http_path_against_the_stub(stub_provider):
+    stub_provider(StubConfig(latency="uniform", latency_ms=20, jitter_ms=10, seed=3))
+    before = llm_client.connection_stats.stats()["requests"]
+    plan = llm_client.generate_plan(_sample_profile(), [])
+    assert isinstance(plan, PlanOut)
+    assert llm_client.connection_stats.stats()["requests"] == before + 1
+
+
+def test_generate_plan_falls_back_when_the_stub_fails(stub_provider):
+    stub_provider(StubConfig(error_rate=1.0))
+    plan = llm_client.generate_plan(_sample_profile(), [])
+    assert plan.summary.model_dump() == llm_client.MOCK_SUMMARY
+
+
+def test_invalid_stub_plan_falls_back_and_is_not_cached(stub_provider):
+    stub_provider(StubConfig(invalid_plan_rate=1.0))
+    plan = llm_client.generate_plan(_sample_profile(), [])
+    assert plan.summary.model_dump() == llm_client.MOCK_SUMMARY
+    assert llm_client.llm_response_cache.stats()["size"] == 0
+
+    stub_provider(StubConfig())
+    before = llm_client.connection_stats.stats()["requests"]
+    llm_client.generate_plan(_sample_profile(), [])
+    assert llm_client.connection_stats.stats()["requests"] == before + 1
+    assert llm_client.llm_response_cache.stats()["size"] == 1
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.chat_service import _build_prompt
+from app.config import settings
+from app.prompt_budget import estimate_tokens, fit_items, fit_recent
+from app.schemas import ChatIn
+
+
+def test_fit_items_keeps_priority_order_and_truncates_the_overflowing_item():
+    items = ["alpha " * 20, "beta " * 40, "gamma " * 10]
+
+    kept = fit_items(items, 70)
+
+    assert kept[0] == items[0]
+    assert kept[1].startswith("beta") and kept[1].endswith("…")
+    assert len(kept) == 2
+    assert sum(estimate_tokens(item) + 1 for item in kept) <= 70
+
+
+def test_fit_recent_prefers_latest_items_in_original_order():
+    turns = [f"user: question number {n} " + "detail " * 10 for n in range(10)]
+
+    kept = fit_recent(turns, 60)
+
+    assert kept == turns[-len(kept) :]
+    assert 0 < len(kept) < len(turns)
+
+
+def test_chat_prompt_stays_within_budget_and_keeps_latest_history(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_PROMPT_TOKEN_BUDGET", 400)
+    history = [{"role": "user", "content": f"turn {n}: " + "blocked account " * 30} for n in range(20)]
+    chat_in = ChatIn(message="How much money do I need?", history=history)
+    snippets = [{"title": f"Doc {n}", "content": "proof of funds " * 60} for n in range(5)]
+
+    prompt = _build_prompt(chat_in, snippets)
+
+    assert estimate_tokens(prompt) <= 400
+    assert "turn 19:" in prompt and "turn 0:" not in prompt
+    assert "Doc 0" in prompt and "How much money do I need?" in prompt
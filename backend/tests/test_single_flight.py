@@ -0,0 +1,59 @@
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"plan": 1}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flights.do, "profile", generate) for _ in range(5)]
+        while flights.coalesced < 4:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_coroutines_share_result_and_errors():
+    flights = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "plan"
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def scenario():
+        shared = await asyncio.gather(*(flights.ado("a", generate) for _ in range(3)))
+        failures = await asyncio.gather(*(flights.ado("b", fail) for _ in range(2)), return_exceptions=True)
+        again = await flights.ado("a", generate)
+        return shared, failures, again
+
+    shared, failures, again = asyncio.run(scenario())
+
+    assert shared == ["plan"] * 3
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    assert again == "plan" and len(calls) == 2
+    assert flights.stats() == {"executions": 3, "coalesced": 3, "in_flight": 0}
@@ -0,0 +1,68 @@
+import { NextResponse } from "next/server"
+
+import { toBackendProfile } from "@/lib/bff-mappers"
+import type { ProfileData } from "@/lib/api"
+
+const normalizeBaseUrl = (url?: string | null) => {
+  if (!url) return null
+  return url.replace(/\/+$/, "")
+}
+
+const FASTAPI_BASE_URL =
+  normalizeBaseUrl(process.env.FASTAPI_BASE_URL) ??
+  normalizeBaseUrl(process.env.NEXT_PUBLIC_API_BASE_URL) ??
+  "http://localhost:8000"
+
+interface IncomingChatBody {
+  message: string
+  context?: ProfileData
+  history?: Array<{ role: string; content: string }>
+}
+
+export async function POST(request: Request) {
+  try {
+    const body: IncomingChatBody = await request.json()
+    if (!body?.message) {
+      return NextResponse.json(
+        { error: { code: "CHAT_INPUT_ERROR", message: "Message is required" } },
+        { status: 400 },
+      )
+    }
+
+    const payload = {
+      message: body.message,
+      profile: body.context ? toBackendProfile(body.context) : undefined,
+      history: body.history ?? [],
+    }
+
+    const response = await fetch(`${FASTAPI_BASE_URL}/api/chat/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+      },
+      body: JSON.stringify(payload),
+    })
+
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => null)
+      const error = data?.error ?? { code: "CHAT_BACKEND_ERROR", message: "Failed to process chat" }
+      return NextResponse.json({ error }, { status: response.status || 502 })
+    }
+
+    // Pass the event stream through untouched so deltas reach the browser as they arrive.
+    return new Response(response.body, {
+      headers: {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        Connection: "keep-alive",
+      },
+    })
+  } catch (error) {
+    console.error("Error proxying chat stream:", error)
+    return NextResponse.json(
+      { error: { code: "CHAT_PROXY_ERROR", message: "Failed to process message" } },
+      { status: 500 },
+    )
+  }
+}